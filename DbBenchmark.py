@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+'''
+Headless benchmarks for the dogbone planning code.
+
+Parts are built from plain coordinate data (see pocketPlate), so nothing in here needs
+Fusion to run.  From the directory above the add-in:
+    python -m <addin folder>.DbBenchmark
+'''
+
+import time
+from math import pi, sqrt, tan
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from types import SimpleNamespace
+
+from .DbTopology import TopologySnapshot, angleWindowMask
+from .DbBoolean import spatialOrder, balancedUnion, foldedUnion
+from .DbPlanning import mergeCylinders, mergeCollinear, _cylinderContains
+from .DbProfile import unionOutline
+
+DEFAULT_PARAMS = SimpleNamespace(acuteAngle=False, obtuseAngle=False, minAngleLimit=89.0, maxAngleLimit=91.0, parametric=False)
+
+
+def _oriented(loop, points, normal, outer):
+    '''
+    orders a loop counterclockwise about normal (outer loop) or clockwise (inner loop)
+    '''
+    nx = ny = nz = 0.0
+    for i, j in zip(loop, loop[1:] + loop[:1]):
+        (x0, y0, z0), (x1, y1, z1) = points[i], points[j]
+        nx += (y0 - y1)*(z0 + z1)
+        ny += (z0 - z1)*(x0 + x1)
+        nz += (x0 - x1)*(y0 + y1)
+    isCounterClockwise = nx*normal[0] + ny*normal[1] + nz*normal[2] > 0
+    return loop if isCounterClockwise == outer else loop[::-1]
+
+
+def pocketPlate(rows=10, cols=10, steps=1, pocketSize=2.0, pitch=3.0, depth=0.5, inset=0.3):
+    '''
+    builds a plate with rows x cols rectangular pockets, each pocket stepped down "steps" times
+    returns (vertices, faces) suitable for TopologySnapshot.fromArrays
+    '''
+    width, height = cols*pitch + pitch, rows*pitch + pitch
+    thickness = depth*steps + 1.0
+    points = []
+    faces = []
+
+    def rect(x0, y0, x1, y1, z):
+        start = len(points)
+        points.extend([(x0, y0, z), (x1, y0, z), (x1, y1, z), (x0, y1, z)])
+        return list(range(start, start + 4))
+
+    def addFace(normal, *loops):
+        faces.append((normal, [_oriented(loop, points, normal, i == 0) for i, loop in enumerate(loops)]))
+
+    plateTop = rect(0, 0, width, height, thickness)
+    plateBottom = rect(0, 0, width, height, 0)
+    pocketTops = []
+
+    for row in range(rows):
+        for col in range(cols):
+            x0, y0 = pitch + col*pitch - pocketSize/2, pitch + row*pitch - pocketSize/2
+            z = thickness
+            top = rect(x0, y0, x0 + pocketSize, y0 + pocketSize, z)
+            pocketTops.append(top)
+            for step in range(steps):
+                shrink = step*inset
+                if step:
+                    top = rect(x0 + shrink, y0 + shrink, x0 + pocketSize - shrink, y0 + pocketSize - shrink, z)
+                    addFace((0, 0, 1), bottom, top)  # floor of the previous step
+                z -= depth
+                bottom = rect(x0 + shrink, y0 + shrink, x0 + pocketSize - shrink, y0 + pocketSize - shrink, z)
+                for i, normal in enumerate(((0, 1, 0), (-1, 0, 0), (0, -1, 0), (1, 0, 0))):
+                    j = (i + 1) % 4
+                    addFace(normal, [top[i], top[j], bottom[j], bottom[i]])
+            addFace((0, 0, 1), bottom)
+
+    addFace((0, 0, 1), plateTop, *pocketTops)
+    addFace((0, 0, -1), plateBottom)
+    for i, normal in enumerate(((0, -1, 0), (1, 0, 0), (0, 1, 0), (-1, 0, 0))):
+        j = (i + 1) % 4
+        addFace(normal, [plateBottom[i], plateBottom[j], plateTop[j], plateTop[i]])
+
+    return points, faces
+
+
+def trianglePlate(rows=10, cols=10, side=2.0, pitch=3.0, depth=0.5):
+    '''
+    builds a plate with rows x cols equilateral triangle pockets - every pocket corner is 60 degrees
+    returns (vertices, faces) suitable for TopologySnapshot.fromArrays
+    '''
+    width, height = cols*pitch + pitch, rows*pitch + pitch
+    thickness = depth + 1.0
+    points = []
+    faces = []
+
+    def addFace(normal, *loops):
+        faces.append((normal, [_oriented(loop, points, normal, i == 0) for i, loop in enumerate(loops)]))
+
+    def addPoints(*newPoints):
+        start = len(points)
+        points.extend(newPoints)
+        return list(range(start, start + len(newPoints)))
+
+    plateTop = addPoints((0, 0, thickness), (width, 0, thickness), (width, height, thickness), (0, height, thickness))
+    plateBottom = addPoints((0, 0, 0), (width, 0, 0), (width, height, 0), (0, height, 0))
+    pocketTops = []
+    for row in range(rows):
+        for col in range(cols):
+            x0, y0 = pitch + col*pitch - side/2, pitch + row*pitch - side*sqrt(3)/4
+            corners = ((x0, y0), (x0 + side, y0), (x0 + side/2, y0 + side*sqrt(3)/2))
+            top = addPoints(*((x, y, thickness) for x, y in corners))
+            bottom = addPoints(*((x, y, thickness - depth) for x, y in corners))
+            pocketTops.append(top)
+            for i in range(3):
+                j = (i + 1) % 3
+                (xi, yi), (xj, yj) = corners[i], corners[j]
+                length = sqrt((xj - xi)**2 + (yj - yi)**2)
+                addFace((-(yj - yi)/length, (xj - xi)/length, 0), [top[i], top[j], bottom[j], bottom[i]])  # normals point into the pocket
+            addFace((0, 0, 1), bottom)
+
+    addFace((0, 0, 1), plateTop, *pocketTops)
+    addFace((0, 0, -1), plateBottom)
+    for i, normal in enumerate(((0, -1, 0), (1, 0, 0), (0, 1, 0), (-1, 0, 0))):
+        j = (i + 1) % 4
+        addFace(normal, [plateBottom[i], plateBottom[j], plateTop[j], plateTop[i]])
+
+    return points, faces
+
+
+def _timed(func, *args, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmarkDetection(rows=20, cols=20, steps=2, params=DEFAULT_PARAMS):
+    '''
+    times snapshot creation, batch edge classification and corner detection
+    over every upward facing floor of a pocket plate
+    '''
+    points, faces = pocketPlate(rows, cols, steps)
+    buildTime, snapshot = _timed(TopologySnapshot.fromArrays, points, faces)
+    classifyTime, _ = _timed(snapshot.classifyEdges)
+
+    floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i] and snapshot.faceNZ[i] > 0.5]
+
+    def detect():
+        corners = [corner for faceIndex in floors for corner in snapshot.faceCorners(faceIndex)]
+        mask = angleWindowMask([corner.angle for corner in corners], params)
+        return [corner for corner, inWindow in zip(corners, mask) if inWindow]
+
+    detectTime, corners = _timed(detect)
+    return {'faces': snapshot.faceCount,
+            'edges': snapshot.edgeCount,
+            'corners': len(corners),
+            'snapshot sec': buildTime,
+            'classify sec': classifyTime,
+            'detection sec': detectTime}
+
+
+def benchmarkBodyDetection(rows=20, cols=15, steps=1):
+    '''
+    times whole-body inside corner detection (one pass over all edges) against
+    running face detection on every floor face in turn
+    '''
+    points, faces = pocketPlate(rows, cols, steps)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    snapshot.classifyEdges()
+    floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i]]
+
+    perFaceTime, perFace = _timed(lambda: {faceIndex: [c for c in snapshot.faceCorners(faceIndex) if c.angle < 3.14159]
+                                           for faceIndex in floors})
+    bodyTime, grouped = _timed(snapshot.bodyCorners)
+    return {'pockets': rows*cols,
+            'floor faces': sum(len(faces) for faces in grouped.values()),
+            'corners': sum(len(corners) for faces in grouped.values() for corners in faces.values()),
+            'per face sec': perFaceTime,
+            'whole body sec': bodyTime}
+
+
+def benchmarkTopFace(rows=20, cols=20, steps=2, queries=100):
+    '''
+    times repeated top face lookups - scanning every face (as getTopFace does without an index)
+    against HeightIndex bucket lookups
+    '''
+    points, faces = pocketPlate(rows, cols, steps)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i] and snapshot.faceNZ[i] > 0.5][:queries]
+
+    def scan():
+        tops = []
+        for faceIndex in floors:
+            nx, ny, nz = snapshot.faceNormal(faceIndex)
+            best = None
+            for other in range(snapshot.faceCount):
+                ox, oy, oz = snapshot.faceNormal(other)
+                if abs(abs(nx*ox + ny*oy + nz*oz) - 1) > 1e-9:
+                    continue
+                x, y, z = snapshot.point(snapshot.edgeStart[snapshot.coEdgeEdge[snapshot.faceCoEdges(other)[0]]])
+                distance = nx*x + ny*y + nz*z
+                if best is None or distance >= best[0]:
+                    best = (distance, other)
+            tops.append(best[1])
+        return tops
+
+    def indexed():
+        heightIndex = snapshot.heightIndex
+        return [heightIndex.topFace(faceIndex) for faceIndex in floors]
+
+    scanTime, scanned = _timed(scan)
+    indexTime, found = _timed(indexed, repeat=1)
+    return {'faces': snapshot.faceCount,
+            'queries': len(floors),
+            'same result': scanned == found,
+            'scan sec': scanTime,
+            'index sec (incl. build)': indexTime}
+
+
+def benchmarkParallelFaces(rows=20, cols=20, steps=2):
+    '''
+    times finding the faces parallel to every planar face - pairwise cross products
+    against grouping by direction key
+    '''
+    points, faces = pocketPlate(rows, cols, steps)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    planar = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i]][:200]
+
+    def pairwise():
+        parallel = {}
+        for faceIndex in planar:
+            nx, ny, nz = snapshot.faceNormal(faceIndex)
+            parallel[faceIndex] = set()
+            for other in range(snapshot.faceCount):
+                ox, oy, oz = snapshot.faceNormal(other)
+                cx, cy, cz = ny*oz - nz*oy, nz*ox - nx*oz, nx*oy - ny*ox
+                if cx*cx + cy*cy + cz*cz < 1e-12:
+                    parallel[faceIndex].add(other)
+        return parallel
+
+    def keyed():
+        grouped = {key: set(faceIndices) for key, faceIndices in snapshot.facesByDirection().items()}
+        return {faceIndex: grouped[snapshot.faceDirections[faceIndex][0]] for faceIndex in planar}
+
+    pairwiseTime, expected = _timed(pairwise, repeat=1)
+    keyedTime, found = _timed(keyed)
+    return {'faces': snapshot.faceCount,
+            'queries': len(planar),
+            'same result': expected == found,
+            'pairwise sec': pairwiseTime,
+            'direction key sec': keyedTime}
+
+
+class _BoxBody:
+    '''
+    stand-in tool body for union benchmarks - a list of axis aligned boxes sorted by xmin
+    '''
+    def __init__(self, box):
+        self.boxes = [box]
+
+
+def _boxUnion(target, tool):
+    '''
+    stand-in boolean: like a real union, the cost grows with the size of both operands -
+    every tool box is tested against the target boxes it may overlap, then the face lists are merged
+    (all boxes are assumed to be the same size)
+    '''
+    starts = [box[0] for box in target.boxes]
+    overlaps = 0
+    for box in tool.boxes:
+        for other in target.boxes[bisect_left(starts, 2*box[0] - box[3]):bisect_right(starts, box[3])]:
+            overlaps += all(box[i] <= other[i + 3] and other[i] <= box[i + 3] for i in range(3))
+    target.boxes = list(merge(target.boxes, tool.boxes))
+    return overlaps
+
+
+def benchmarkUnion(cornerCounts=(10, 100, 1000), radius=0.25, depth=1.0):
+    '''
+    times the left fold of dogbone tool bodies against the spatially ordered, balanced union
+    using the corners of a pocket plate and the _boxUnion cost model
+    '''
+    results = {}
+    for count in cornerCounts:
+        side = 1
+        while 4*side*side < count:
+            side += 1
+        points, faces = pocketPlate(side, side)
+        snapshot = TopologySnapshot.fromArrays(points, faces)
+        floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i] and snapshot.faceNZ[i] > 0.5]
+        centres = [snapshot.point(corner.vertex) for faceIndex in floors for corner in snapshot.faceCorners(faceIndex)][:count]
+
+        def bodies():
+            return [_BoxBody((x - radius, y - radius, z, x + radius, y + radius, z + depth)) for x, y, z in centres]
+
+        foldTime, _ = _timed(lambda: foldedUnion(bodies(), _boxUnion))
+        balancedTime, _ = _timed(lambda: balancedUnion(spatialOrder(bodies(), centres), _boxUnion))
+        results[count] = {'fold sec': foldTime, 'balanced sec': balancedTime}
+    return results
+
+
+def benchmarkMerge(rows=10, cols=10, radius=0.25):
+    '''
+    times collapsing duplicate and contained dogbone cylinders - spatial hash against testing every pair
+    every pocket corner is planned twice (as if reached from two faces) plus a shorter cylinder inside it
+    '''
+    points, faces = pocketPlate(rows, cols)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i] and snapshot.faceNZ[i] > 0.5]
+    cylinders = []
+    for faceIndex in floors:
+        for corner in snapshot.faceCorners(faceIndex):
+            start, end = snapshot.point(corner.vertex), snapshot.point(corner.other)
+            middle = tuple((a + b)/2 for a, b in zip(start, end))
+            cylinders.extend([(start, end, radius), (start, end, radius), (start, middle, radius)])
+
+    def pairwise():
+        dropped = {}
+        for index in range(len(cylinders)):
+            for other in range(len(cylinders)):
+                if other != index and other not in dropped and _cylinderContains(cylinders[other], cylinders[index]):
+                    dropped[index] = other
+                    break
+        return len(dropped)
+
+    pairwiseTime, expected = _timed(pairwise, repeat=1)
+    hashTime, (kept, dropped) = _timed(mergeCylinders, cylinders)
+    return {'cylinders': len(cylinders),
+            'booleans saved': len(dropped),
+            'same count': expected == len(dropped),
+            'pairwise sec': pairwiseTime,
+            'spatial hash sec': hashTime}
+
+
+def benchmarkStacked(rows=10, cols=10, levels=3, radius=0.25):
+    '''
+    stacked dogbones - every pocket corner axis repeated at levels depths, each cylinder starting
+    where the one above ends (as on a stepped pocket whose walls line up) - counts the tool bodies
+    left after the containment merge alone and after joining collinear cylinders
+    '''
+    points, faces = pocketPlate(rows, cols)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    floors = [i for i in range(snapshot.faceCount) if snapshot.faceIsPlane[i] and snapshot.faceNZ[i] > 0.5]
+    cylinders = []
+    for faceIndex in floors:
+        for corner in snapshot.faceCorners(faceIndex):
+            start, end = snapshot.point(corner.vertex), snapshot.point(corner.other)
+            step = tuple(b - a for a, b in zip(start, end))
+            for level in range(levels):
+                top = tuple(a + level*d for a, d in zip(start, step))
+                cylinders.append((top, tuple(a + d for a, d in zip(top, step)), radius))
+
+    def merged():
+        kept, dropped = mergeCylinders(cylinders)
+        spans = mergeCollinear([cylinders[i] for i in kept])
+        return len(kept), len(spans)
+
+    mergeTime, (afterContainment, afterCollinear) = _timed(merged)
+    return {'cylinders': len(cylinders),
+            'after containment': afterContainment,
+            'after collinear': afterCollinear,
+            'sec': mergeTime}
+
+
+def benchmarkAcute(rows=15, cols=15, radius=0.25):
+    '''
+    acute corner tool bodies on a plate of 60 degree triangle pockets - counts the solid operations
+    of the cylinder + clearance box + union scheme (per corner, and per distinct shape with the
+    template cache) against one keyhole prism per distinct shape, and times the keyhole outlines
+    '''
+    points, faces = trianglePlate(rows, cols)
+    snapshot = TopologySnapshot.fromArrays(points, faces)
+    params = SimpleNamespace(acuteAngle=True, obtuseAngle=False, minAngleLimit=10.0, maxAngleLimit=91.0, parametric=False)
+    corners = [corner for faceIndex in range(snapshot.faceCount) if snapshot.faceIsPlane[faceIndex]
+               for corner in snapshot.faceCorners(faceIndex)]
+    corners = [corner for corner, inWindow in zip(corners, angleWindowMask([corner.angle for corner in corners], params)) if inWindow]
+    acute = [corner for corner in corners if corner.angle < pi/2]
+
+    def outlines():
+        shapes = {}
+        for corner in acute:
+            length = sqrt(sum((a - b)**2 for a, b in zip(snapshot.point(corner.vertex), snapshot.point(corner.other))))
+            key = (round(length, 9), round(corner.angle, 9))
+            if key not in shapes:
+                boxLength = radius/tan(corner.angle/2) - radius
+                shapes[key] = unionOutline([(0, 0, radius)], [[(0, -radius), (boxLength, -radius), (boxLength, radius), (0, radius)]])
+        return shapes
+
+    outlineTime, shapes = _timed(outlines)
+    return {'corners': len(corners),
+            'acute corners': len(acute),
+            'corner angle deg': round(acute[0].angle*180/pi, 3) if acute else None,
+            'distinct shapes': len(shapes),
+            'solid ops untemplated box scheme': 3*len(acute),
+            'solid ops templated box scheme': 3*len(shapes),
+            'solid ops templated keyhole': len(shapes),
+            'outline sec': outlineTime}
+
+
+def main():
+    for rows, cols in ((5, 5), (10, 10), (20, 20)):
+        print(f'detection {rows}x{cols}:', benchmarkDetection(rows, cols))
+    print('whole body 300 pockets:', benchmarkBodyDetection())
+    print('top face:', benchmarkTopFace())
+    print('parallel faces:', benchmarkParallelFaces())
+    for count, result in benchmarkUnion().items():
+        print(f'union {count} corners:', result)
+    print('merge:', benchmarkMerge())
+    print('stacked:', benchmarkStacked())
+    print('acute:', benchmarkAcute())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+'''
+Scheduling of boolean unions over many tool bodies.
+
+Folding every tool body into one accumulator makes each union work on an ever growing
+body.  Here tool bodies are first ordered along a Morton (Z-order) curve, so neighbours in
+the list are neighbours in space, then merged pairwise in a balanced tree - intermediate
+bodies stay small and local.  No adsk imports: the union itself is passed in, so the
+scheduler can be benchmarked outside of Fusion.
+'''
+
+MORTON_BITS = 10  # bits per axis - 1024 cells along the longest side of the bounding box
+
+
+def _spread(value):
+    '''
+    spreads the low MORTON_BITS bits of value so there are two zero bits between each
+    '''
+    result = 0
+    for bit in range(MORTON_BITS):
+        result |= ((value >> bit) & 1) << (3*bit)
+    return result
+
+
+def mortonCodes(points):
+    '''
+    Morton code of each (x, y, z) point, quantized over the common bounding box
+    '''
+    if not points:
+        return []
+    lows = [min(point[axis] for point in points) for axis in range(3)]
+    span = max(max(point[axis] for point in points) - lows[axis] for axis in range(3)) or 1.0
+    scale = ((1 << MORTON_BITS) - 1)/span
+
+    codes = []
+    for point in points:
+        x, y, z = (int((point[axis] - lows[axis])*scale) for axis in range(3))
+        codes.append(_spread(x) | (_spread(y) << 1) | (_spread(z) << 2))
+    return codes
+
+
+def spatialOrder(items, points):
+    '''
+    returns items sorted along the Morton curve through their points (one (x, y, z) per item)
+    '''
+    codes = mortonCodes(points)
+    return [item for _, _, item in sorted(zip(codes, range(len(codes)), items))]
+
+
+def balancedUnion(bodies, union):
+    '''
+    merges bodies pairwise, level by level, and returns the single resulting body (None if there are none)
+    union(target, tool) must merge tool into target in place - as TemporaryBRepManager.booleanOperation does
+    '''
+    level = list(bodies)
+    while len(level) > 1:
+        merged = []
+        for i in range(0, len(level) - 1, 2):
+            union(level[i], level[i + 1])
+            merged.append(level[i])
+        if len(level) % 2:
+            merged.append(level[-1])
+        level = merged
+    return level[0] if level else None
+
+
+def foldedUnion(bodies, union):
+    '''
+    merges every body into the first one in turn - the original scheme, kept for comparison
+    '''
+    bodies = list(bodies)
+    if not bodies:
+        return None
+    for body in bodies[1:]:
+        union(bodies[0], body)
+    return bodies[0]
@@ -1,6 +1,6 @@
 import logging
  
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 import adsk.core, adsk.fusion
 import math
@@ -11,6 +11,8 @@ import json
 import time
 from . import dbutils as dbUtils
 from .decorators import eventHandler
+from .DbTopology import TopologySnapshot, CornerEdge, FaceCorner, angleWindowMask
+from .DbProfile import unionOutline
 from math import sqrt, tan, pi
 
 logger = logging.getLogger('dogbone.DbClasses')
@@ -21,7 +23,7 @@ _ui = _app.userInterface
 _rootComp = _design.rootComponent
 
 class DbFace:
-    def __init__(self, parent, face:adsk.fusion.BRepFace, params, commandInputsEdgeSelect):
+    def __init__(self, parent, face:adsk.fusion.BRepFace, params, commandInputsEdgeSelect, corners = None):
         from .Dogbone import DogboneCommand
         self.face = face = face if face.isValid else _design.findEntityByToken(self._entityToken)[0] # self.component.findBRepUsingPoint(self._refPoint, adsk.fusion.BRepEntityTypes.BRepFaceEntityType,-1.0 ,False ).item(0) 
         self.parent:DogboneCommand = parent
@@ -34,63 +36,49 @@ class DbFace:
         self._selected = True
         self._params = params
         self._associatedEdgesDict = {} # Keyed with edge
-        processedEdges = [] # used for quick checking if an edge is already included (below)
         self._customGraphicGroup = None #
 
         #==============================================================================
         #             this is where inside corner edges, dropping down from the face are processed
+        #             detection runs against the (cached) topology snapshot of the native body
         #==============================================================================
 
-        faceNormal = dbUtils.getFaceNormal(face)
+        snapshot:TopologySnapshot = parent.topologySnapshot(self.native)
+        self._corners = corners if corners is not None \
+            else snapshot.faceCorners(snapshot.faceIndex(self.native)) # every candidate, with its classified angle
+        self._cornerEdgeIds = {} # key: snapshot edge index, value: edgeId of the DbEdge currently in the angle window
+        self.applyAngleLimits()
 
-        faceEdgesSet = {hash(edge.entityToken) for edge in face.edges}
-        faceVertices = [vertex for vertex in face.vertices]
-        allEdges = {}
-        for vertex  in faceVertices:
-            allEdges.update({hash(edge.entityToken): edge for edge in vertex.edges})
-
-        candidateEdgesId = set(allEdges.keys()) - faceEdgesSet
-        candidateEdges = [allEdges[edgeId] for edgeId in candidateEdgesId]
-
-        # for edge in self.face.body.edges:
-        for edge in candidateEdges:
-            if not edge.isValid:
-                continue
-            if edge.isDegenerate:
+    def applyAngleLimits(self):
+        '''
+        re-applies the angle window of the current params to the cached corner angles
+        only edges that enter or leave the window are created or removed
+        '''
+        mask = angleWindowMask([corner.angle for corner in self._corners], self._params)
+        snapshot:TopologySnapshot = self.parent.topologySnapshot(self.native)
+
+        for corner, inWindow in zip(self._corners, mask):
+            edgeId = self._cornerEdgeIds.get(corner.edge)
+            if not inWindow:
+                if edgeId is not None:
+                    edgeObj = self._associatedEdgesDict.pop(edgeId)
+                    self.parent.selectedEdges.pop(edgeId, None)
+                    del self._cornerEdgeIds[corner.edge]
+                    _ui.activeSelections.removeByEntity(edgeObj.edge)
                 continue
-            if edge in processedEdges:
+            if edgeId is not None:
                 continue
             try:
-                if edge.geometry.curveType != adsk.core.Curve3DTypes.Line3DCurveType:
-                    continue
-                vector:adsk.core.Vector3D = dbUtils.getEdgeVector(edge, refFace = face) 
-                vector.normalize()
-                if not vector.isParallelTo(faceNormal):
-                    continue
-                if vector.isEqualTo(faceNormal):
-                    continue
-                face1, face2 = edge.faces 
-                if face1.geometry.objectType != adsk.core.Plane.classType():
-                    continue
-                if face2.geometry.objectType != adsk.core.Plane.classType():
-                    continue 
-
-                angle = dbUtils.getAngleBetweenFaces(edge)*180/pi
-                if (abs(angle - 90) > 0.001 ) and not(params.acuteAngle or params.obtuseAngle ) \
-                    or (not (params.minAngleLimit < angle <= 90) and params.acuteAngle and not params.obtuseAngle) \
-                    or (not(90 <= angle < params.maxAngleLimit) and not params.acuteAngle and params.obtuseAngle) \
-                    or (not (params.minAngleLimit < angle < params.maxAngleLimit) and params.acuteAngle and params.obtuseAngle):
-                    continue
-
-                if ((abs(angle-90) > 0.001) and params.parametric):
-                    continue
-
+                edge = snapshot.edgeEntities[corner.edge]
+                if self.face.assemblyContext:
+                    edge = edge.createForAssemblyContext(self.face.assemblyContext)
                 edgeId = hash(edge.entityToken)
-                parent.selectedEdges[edgeId] = self._associatedEdgesDict[edgeId] = DbEdge(edge = edge, parentFace = self)
-                processedEdges.append(edge)
-                parent.addingEdges = True
-                self.commandInputsEdgeSelect.addSelection(edge)
-                parent.addingEdges = False
+                self.parent.selectedEdges[edgeId] = self._associatedEdgesDict[edgeId] = DbEdge(edge = edge, parentFace = self, corner = corner)
+                self._cornerEdgeIds[corner.edge] = edgeId
+                if self.commandInputsEdgeSelect:  # None when faces are selected again by the refresh command
+                    self.parent.addingEdges = True
+                    self.commandInputsEdgeSelect.addSelection(edge)
+                    self.parent.addingEdges = False
             except:
                 dbUtils.messageBox('Failed at edge:\n{}'.format(traceback.format_exc()))
 
@@ -127,8 +115,7 @@ class DbFace:
         self.parent.addingEdges = False
 
     def reSelectEdges(self):
-        # self._associatedEdgesDict = {}
-        self.__init__(self.parent, self.face, self._params, self.commandInputsEdgeSelect)
+        self.applyAngleLimits()
 
     @property
     def refPoint(self):
@@ -195,7 +182,7 @@ class DbFace:
     
 class DbEdge:
 
-    def __init__(self, edge:adsk.fusion.BRepEdge, parentFace:DbFace):
+    def __init__(self, edge:adsk.fusion.BRepEdge, parentFace:DbFace, corner:CornerEdge = None):
         self.edge = edge = edge if edge.isValid else self.component.findBRepUsingPoint(self._refPoint, adsk.fusion.BRepEntityTypes.BRepEdgeEntityType,-1.0 ,False ).item(0)
 
         self._refPoint = edge.nativeObject.pointOnEdge if edge.assemblyContext else edge.pointOnEdge
@@ -205,10 +192,16 @@ class DbEdge:
         self._parentFace = parentFace
         self._native = self.edge.nativeObject if self.edge.nativeObject else self.edge
         self._component = edge.body.parentComponent
+        self._customGraphicGroup = None
+        self._cornerVertex = None # snapshot index of the face vertex, when known
+
+        if corner:
+            self._initFromCorner(corner)
+            return
 
         face1, face2 = (face for face in self._native.faces)
-        _,face1normal = face1.evaluator.getNormalAtPoint(face1.pointOnFace)
-        _,face2normal = face2.evaluator.getNormalAtPoint(face2.pointOnFace)
+        face1normal = dbUtils.getFaceNormal(face1)
+        face2normal = dbUtils.getFaceNormal(face2)
         face1normal.add(face2normal)
         face1normal.normalize()
         self._cornerVector = face1normal
@@ -216,22 +209,35 @@ class DbEdge:
         self._cornerAngle = dbUtils.getAngleBetweenFaces(edge)
         self._customGraphicGroup = None
 
-        self._dogboneCentre = self.native.startVertex.geometry \
-            if self.native.startVertex in self._parentFace.native.vertices \
-            else self.native.endVertex.geometry
-        
-        self._nativeEndPoints = (self.native.startVertex.geometry, self.native.endVertex.geometry)\
-                if self.native.startVertex in self._parentFace.native.vertices\
-                    else (self.native.endVertex.geometry, self.native.startVertex.geometry)
+        index = self._parentFace.parent.topologySnapshot(self._native).adjacency
+        atStart = dbUtils.isStartVertexOnFace(self._parentFace.native, self._native, index)
+
+        self._nativeEndPoints = (self.native.startVertex.geometry, self.native.endVertex.geometry) if atStart \
+            else (self.native.endVertex.geometry, self.native.startVertex.geometry)
+        self._dogboneCentre = self._nativeEndPoints[0]
 
         startPoint, endPoint = self._nativeEndPoints
         
         self._nativeEdgeVector:adsk.core.Vector3D = startPoint.vectorTo(endPoint)
         self._nativeEdgeVector.normalize()
 
-        self._endPoints = (self.edge.startVertex.geometry, self.edge.endVertex.geometry)\
-                if self.edge.startVertex in self._parentFace.face.vertices\
-                    else (self.edge.endVertex.geometry, self.edge.startVertex.geometry)
+        self._endPoints = (self.edge.startVertex.geometry, self.edge.endVertex.geometry) if atStart \
+            else (self.edge.endVertex.geometry, self.edge.startVertex.geometry)
+
+    def _initFromCorner(self, corner:CornerEdge):
+        '''
+        takes angle, vectors and orientation from the topology snapshot - no face or vertex walking needed
+        '''
+        self._cornerAngle = corner.angle
+        self._cornerVertex = corner.vertex
+        self._cornerVector = adsk.core.Vector3D.create(*corner.cornerVector)
+        self._nativeEdgeVector = adsk.core.Vector3D.create(*corner.edgeVector)
+
+        self._nativeEndPoints = (self.native.startVertex.geometry, self.native.endVertex.geometry) if corner.atStart \
+            else (self.native.endVertex.geometry, self.native.startVertex.geometry)
+        self._dogboneCentre = self._nativeEndPoints[0]
+        self._endPoints = (self.edge.startVertex.geometry, self.edge.endVertex.geometry) if corner.atStart \
+            else (self.edge.endVertex.geometry, self.edge.startVertex.geometry)
 
     def __hash__(self):
         return self._edgeId
@@ -282,9 +288,21 @@ class DbEdge:
         '''
         return self._endPoints
     
+    @property
+    def faceCorner(self)->FaceCorner:
+        '''
+        face corner at the dogbone end of the edge - both parent face edges meeting there, their lengths and directions
+        '''
+        snapshot:TopologySnapshot = self._parentFace.parent.topologySnapshot(self.native)
+        vertexIndex = self._cornerVertex if self._cornerVertex is not None \
+            else snapshot.vertexIndex(dbUtils.getVertexAtFace(self._parentFace.native, self.native, snapshot.adjacency))
+        return snapshot.faceCornerMap(snapshot.faceIndex(self._parentFace.native))[vertexIndex]
+
     @property
     def cornerEdges(self):
-        return dbUtils.getCornerEdgesAtFace(face = self._parentFace, edge = self.edge)
+        return dbUtils.getCornerEdgesAtFace(face = self._parentFace.native, 
+                                            edge = self.native, 
+                                            index = self._parentFace.parent.topologySnapshot(self.native).adjacency)
 
     @property
     def cornerVector(self)->adsk.core.Vector3D:
@@ -305,114 +323,201 @@ class DbEdge:
     def faceObj(self):
         return self._parentFace
     
-    def __eq__(self, __o: object) -> bool:
-        if isinstance(__o, DbEdge):
-            return __o.hash == self._hash
-        if isinstance(__o, str):
-            return hash(__o) == self._hash
-        if isinstance(__o, adsk.fusion.BRepEdge):
-            return __o == self._edge
-        return NotImplemented
-    
-    def __hash__(self) -> int:
-        return self._hash
-
     @property
     def native(self):
         return self.edge.nativeObject if self.edge.nativeObject else self.edge
     
-    @classmethod
-    def __getToolBody(cls, edgeObj, params, topFace:adsk.fusion.BRepFace = None):
+    def toolAxis(self, params, topFace:adsk.fusion.BRepFace = None):
+        '''
+        returns (startPoint, endPoint) of the dogbone tool axis in native space
+        startPoint is at the face end - or on the top face plane, when topFace is given
+        '''
         from .DbData import DbParams
         params: DbParams
-        edgeObj: DbEdge
-        box = None
 
-        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
-        startPoint, endPoint = edgeObj.nativeEndPoints
+        startPoint, endPoint = self.nativeEndPoints
         startPoint, endPoint = startPoint.copy(), endPoint.copy()
         effectiveRadius = (params.toolDia + params.toolDiaOffset)/2
         centreDistance = effectiveRadius*((1+params.minimalPercent/100) if params.dbType == 'Minimal Dogbone' else  1)
 
         if topFace:
-            translateVector = dbUtils.getTranslateVectorBetweenFaces(edgeObj._parentFace.face, topFace)
+            translateVector = dbUtils.getTranslateVectorBetweenFaces(self._parentFace.face, topFace, self._parentFace.parent.topologySnapshot(topFace))
             startPoint.translateBy(translateVector)
 
 
         if params.dbType == 'Mortise Dogbone':
-            (edge0, edge1) = edgeObj.cornerEdges
-            direction0 = dbUtils.correctedEdgeVector(edge0,startPoint) 
-            direction1 = dbUtils.correctedEdgeVector(edge1,startPoint) 
+            corner = self.faceCorner
+            direction0 = adsk.core.Vector3D.create(*corner.incomingVector)
+            direction1 = adsk.core.Vector3D.create(*corner.outgoingVector)
             if params.longSide:
-                if (edge0.length > edge1.length):
+                if (corner.incomingLength > corner.outgoingLength):
                     dirVect = direction0
                 else:
                     dirVect = direction1
             else:
-                if (edge0.length > edge1.length):
+                if (corner.incomingLength > corner.outgoingLength):
                     dirVect = direction1
                 else:
                     dirVect = direction0
             dirVect.normalize()
         else:
-            dirVect = edgeObj.cornerVector.copy()
+            dirVect = self.cornerVector.copy()
             dirVect.normalize()
 
         dirVect.scaleBy(centreDistance)
         startPoint.translateBy(dirVect)
         endPoint.translateBy(dirVect)
+        return startPoint, endPoint
 
-        toolbody = tempBrepMgr.createCylinderOrCone(endPoint, effectiveRadius, startPoint, effectiveRadius)
-
-        if edgeObj.cornerAngle >= pi/2:
-            return toolbody
-
-        # creating a box that will be used to clear the path the tool takes to the dogbone hole
-        # box width is toolDia
-        # box height is same as edge length
-        # box length is from the hole centre to the point where the tool meets the sides
+    @classmethod
+    def __getToolBody(cls, edgeObj, params, topFace:adsk.fusion.BRepFace = None, axis = None):
+        from .DbData import DbParams
+        params: DbParams
+        edgeObj: DbEdge
 
-        edgeHeight = startPoint.distanceTo(endPoint)
+        startPoint, endPoint = axis if axis else edgeObj.toolAxis(params, topFace)
+        effectiveRadius = (params.toolDia + params.toolDiaOffset)/2
+        centreDistance = effectiveRadius*((1+params.minimalPercent/100) if params.dbType == 'Minimal Dogbone' else  1)
 
-        logger.debug("Adding acute angle clearance box")
-        cornerTan = tan(edgeObj.cornerAngle/2)
+        xAxis = edgeObj.cornerVector.copy()
+        xAxis.normalize()
+        zAxis = startPoint.vectorTo(endPoint)
+        zAxis.normalize()
+
+        return toolBodyCache.toolBody(origin = startPoint, 
+                                      xAxis = xAxis, 
+                                      zAxis = zAxis, 
+                                      radius = effectiveRadius, 
+                                      length = startPoint.distanceTo(endPoint), 
+                                      angle = edgeObj.cornerAngle, 
+                                      centreDistance = centreDistance, 
+                                      dbType = params.dbType)
+
+    def getToolBody(self, params, topFace:adsk.fusion.BRepFace = None, axis = None):
+        '''
+        axis - optional (startPoint, endPoint) from toolAxis, saves working it out again
+        '''
+        return DbEdge.__getToolBody(self, params, topFace, axis)
+    
+    def addCustomGraphic(self):
+        if not self._parentFace._customGraphicGroup:
+            self._parentFace._customGraphicGroup = self._component.customGraphicsGroups.add()
+        coordList = []
+        [coordList.extend([n for n in p.asArray()]) for p in self.endPoints]
+        coords = adsk.fusion.CustomGraphicsCoordinates.create(coordList)
+        
+        # body:adsk.fusion.CustomGraphicsBRepBody = self._parentFace._customGraphicGroup.addBRepBody(self.edge.body)
 
-        boxCentrePoint = startPoint.copy() 
-        boxLength = effectiveRadius/cornerTan - centreDistance
-        boxWidth = effectiveRadius*2
+        line:adsk.fusion.CustomGraphicsLine = self._parentFace._customGraphicGroup.addLines(coords, [], False)
+        line.color = adsk.fusion.CustomGraphicsSolidColorEffect.create(adsk.core.Color.create(0,255,0,255))
+        line.id = str(self._edgeId)
+        line.isSelectable = True
 
-        lengthDirectionVector = edgeObj.cornerVector.copy()
-        lengthDirectionVector.normalize()
-        lengthDirectionVector.scaleBy(boxLength/2)
 
-        if lengthDirectionVector.length < 0.01:
-            return toolbody
+TOOL_BODY_MEMO_SIZE = 2000  # placed tool bodies kept between command runs
+
+class ToolBodyCache:
+    '''
+    dogbone tool body templates, keyed by (effective radius, length, corner angle, dogbone type)
+    each distinct shape is built once in a local frame - origin at the dogbone end on the face,
+    x along the corner vector, z along the edge - and placed with copy + transform
+    templates are valid for one command execution - clear() when params or the design change
+
+    placed tool bodies are also memoised, least recently used first out, keyed by their frame
+    (origin, x and z axes) and template key - the frame already folds in the native edge geometry,
+    the resolved tool parameters and the top face offset, so the memo outlives clear() and a
+    re-run after undo or a parameter tweak only rebuilds the corners whose inputs changed
+    '''
+    def __init__(self, memoSize = TOOL_BODY_MEMO_SIZE):
+        self._templates = {}
+        self._bodies = OrderedDict()
+        self.memoSize = memoSize
+        self.hits = 0
+        self.misses = 0
+        self.memoHits = 0
+        self.memoMisses = 0
+
+    def clear(self):
+        logger.debug(f'tool body cache cleared - templates: {len(self._templates)}, hits: {self.hits}, misses: {self.misses}; '
+                     f'memo: {len(self._bodies)} bodies, hits: {self.memoHits}, misses: {self.memoMisses}')
+        self._templates = {}
+        self.hits = 0
+        self.misses = 0
+        self.memoHits = 0
+        self.memoMisses = 0
+
+    def clearMemo(self):
+        self._bodies = OrderedDict()
+
+    def toolBody(self, origin:adsk.core.Point3D, xAxis:adsk.core.Vector3D, zAxis:adsk.core.Vector3D, 
+                 radius, length, angle, centreDistance, dbType)->adsk.fusion.BRepBody:
+        '''
+        returns a transient copy of the template, moved into place
+        xAxis and zAxis must be orthogonal unit vectors
+        '''
+        # the angle only changes the shape of acute corners (clearance box)
+        # centreDistance too - it follows minimalPercent, which can change between previews
+        key = (round(radius, 9), round(length, 9), round(angle, 9) if angle < pi/2 else None, dbType, 
+               round(centreDistance, 9) if angle < pi/2 else None)
+        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
 
-        heightDirectionVector = edgeObj.edgeVector.copy()
-        heightDirectionVector.normalize()
-        heightDirectionVector.scaleBy(edgeHeight/2)
+        # booleans merge into their target body - callers always get a copy of the memoised body
+        memoKey = (tuple(round(value, 9) for vector in (origin, xAxis, zAxis) for value in vector.asArray()), key)
+        placed = self._bodies.get(memoKey)
+        if placed is not None:
+            self.memoHits += 1
+            self._bodies.move_to_end(memoKey)
+            return tempBrepMgr.copy(placed)
+        self.memoMisses += 1
+
+        template = self._templates.get(key)
+        if template is None:
+            self.misses += 1
+            template = self._templates[key] = self.__createTemplate(radius, length, angle, centreDistance)
+        else:
+            self.hits += 1
+
+        toolbody = tempBrepMgr.copy(template)
+        matrix = adsk.core.Matrix3D.create()
+        matrix.setToAlignCoordinateSystems(adsk.core.Point3D.create(0, 0, 0), 
+                                           adsk.core.Vector3D.create(1, 0, 0), 
+                                           adsk.core.Vector3D.create(0, 1, 0), 
+                                           adsk.core.Vector3D.create(0, 0, 1),
+                                           origin, xAxis, zAxis.crossProduct(xAxis), zAxis)
+        tempBrepMgr.transform(toolbody, matrix)
+
+        self._bodies[memoKey] = tempBrepMgr.copy(toolbody)
+        while len(self._bodies) > self.memoSize:
+            self._bodies.popitem(last = False)
+        return toolbody
 
-        heightDirectionVector.add(lengthDirectionVector)
+    @staticmethod
+    def __createTemplate(radius, length, angle, centreDistance)->adsk.fusion.BRepBody:
+        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
+        origin = adsk.core.Point3D.create(0, 0, 0)
 
-        lengthDirectionVector.normalize()
+        # acute corners need clearance for the path the tool takes to the dogbone hole
+        # tool diameter wide, from the hole centre to the point where the tool meets the sides
+        boxLength = radius/tan(angle/2) - centreDistance if angle < pi/2 else 0
 
-        boxCentrePoint.translateBy(heightDirectionVector)
-        
-        #   rotate centreLine Vector (cornerVector) by 90deg to get width direction vector
-        orthogonalMatrix = adsk.core.Matrix3D.create()
-        orthogonalMatrix.setToRotation(pi/2, edgeObj.edgeVector, boxCentrePoint)
+        if boxLength/2 < 0.01:
+            return tempBrepMgr.createCylinderOrCone(adsk.core.Point3D.create(0, 0, length), radius, origin, radius)
 
-        widthDirectionVector = edgeObj.cornerVector.copy()
-        widthDirectionVector.transformBy(orthogonalMatrix)
+        # keyhole outline (circle + clearance) extruded along the edge in one go
+        logger.debug("Adding acute angle clearance")
+        outline = unionOutline([(0, 0, radius)], [[(0, -radius), (boxLength, -radius), (boxLength, radius), (0, radius)]])
+        toolbody = dbUtils.createPrism(outline[0], length) if len(outline) == 1 else None
+        if toolbody:
+            return toolbody
 
-        boxLength = .001 if (boxLength < 0.001) else boxLength 
-        
-        boundaryBox = adsk.core.OrientedBoundingBox3D.create(centerPoint = boxCentrePoint, 
-                                                            lengthDirection = lengthDirectionVector, 
-                                                            widthDirection = widthDirectionVector, 
+        logger.debug("keyhole prism failed - falling back to cylinder and clearance box")
+        toolbody = tempBrepMgr.createCylinderOrCone(adsk.core.Point3D.create(0, 0, length), radius, origin, radius)
+        boundaryBox = adsk.core.OrientedBoundingBox3D.create(centerPoint = adsk.core.Point3D.create(boxLength/2, 0, length/2), 
+                                                            lengthDirection = adsk.core.Vector3D.create(1, 0, 0), 
+                                                            widthDirection = adsk.core.Vector3D.create(0, 1, 0), 
                                                             length = boxLength, 
-                                                            width = boxWidth, 
-                                                            height = edgeHeight)
+                                                            width = radius*2, 
+                                                            height = length)
         
         box = tempBrepMgr.createBox(boundaryBox)
 
@@ -421,24 +526,5 @@ class DbEdge:
                                     booleanType = adsk.fusion.BooleanTypes.UnionBooleanType)
 
         return toolbody
-    
-    def getToolBody(self, params, topFace:adsk.fusion.BRepFace = None):
-        return DbEdge.__getToolBody(self, params, topFace)
-    
-    def addCustomGraphic(self):
-        if not self._parentFace._customGraphicGroup:
-            self._parentFace._customGraphicGroup = self._component.customGraphicsGroups.add()
-        coordList = []
-        [coordList.extend([n for n in p.asArray()]) for p in self.endPoints]
-        coords = adsk.fusion.CustomGraphicsCoordinates.create(coordList)
-        
-        # body:adsk.fusion.CustomGraphicsBRepBody = self._parentFace._customGraphicGroup.addBRepBody(self.edge.body)
-
-        line:adsk.fusion.CustomGraphicsLine = self._parentFace._customGraphicGroup.addLines(coords, [], False)
-        line.color = adsk.fusion.CustomGraphicsSolidColorEffect.create(adsk.core.Color.create(0,255,0,255))
-        line.id = str(self._edgeId)
-        line.isSelectable = True
-
-
-
 
+toolBodyCache = ToolBodyCache()
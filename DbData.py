@@ -37,6 +37,7 @@ class DbParams:
      expandSettingsGroup: bool = True    
      logging: int = 0
      benchmark: bool = False
+     holesPerFace: bool = False
 
      @property
      def toolDia(self):
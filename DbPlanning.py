@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+'''
+Planning of dogbones in native (component) space.
+
+Faces picked in different occurrences of one component resolve to the same native
+faces and edges.  Dogbones are cut into the native body, so every occurrence of the
+component gets them - planning once per native body and skipping native edges that are
+already planned means an assembly with many copies of a part costs the same as a
+single copy.  No adsk imports: ids and geometry are supplied by the caller.
+'''
+
+from math import sqrt
+
+MERGE_TOLERANCE = 1e-6  # cm
+
+
+class DogbonePlan:
+    '''
+    Faces and edges to process for one native body, in selection order
+    faces holds (face, [edge, ...]) for the first selection of each native face, with only
+    the edges not already planned through another occurrence
+    '''
+    def __init__(self, bodyId):
+        self.bodyId = bodyId
+        self.faces = []
+        self.occurrenceIds = set()
+        self.duplicateEdges = 0
+        self._faceIndex = {}  # native face id -> position in faces
+        self._edgeIds = set()
+
+    def add(self, occurrenceId, faceId, face, edges):
+        '''
+        faceId - native face id, edges - [(native edge id, edge), ...]
+        '''
+        self.occurrenceIds.add(occurrenceId)
+        position = self._faceIndex.get(faceId)
+        if position is None:
+            position = self._faceIndex[faceId] = len(self.faces)
+            self.faces.append((face, []))
+        plannedEdges = self.faces[position][1]
+        for edgeId, edge in edges:
+            if edgeId in self._edgeIds:
+                self.duplicateEdges += 1
+                continue
+            self._edgeIds.add(edgeId)
+            plannedEdges.append(edge)
+
+    @property
+    def edges(self):
+        return [edge for _, edges in self.faces for edge in edges]
+
+    @property
+    def edgeCount(self):
+        return len(self._edgeIds)
+
+
+def planDogbones(selectedOccurrences, bodyId, faceId, edgeId, directionId=None):
+    '''
+    groups the selected faces of every occurrence by native body
+    selectedOccurrences - {occurrenceId: [face, ...]}, faces expose selectedEdges
+    bodyId(face), faceId(face), edgeId(edge) - native ids
+    directionId(face) - optional native face direction; faces of one body picked through different
+    occurrences need not point the same way, and a plan shares one top face, so plans are split by it
+    returns {(native body id, direction id): DogbonePlan}, in selection order
+    '''
+    plans = {}
+    for occurrenceId, faces in selectedOccurrences.items():
+        for face in faces:
+            nativeBodyId = bodyId(face)
+            planId = (nativeBodyId, directionId(face) if directionId else None)
+            plan = plans.get(planId)
+            if plan is None:
+                plan = plans[planId] = DogbonePlan(nativeBodyId)
+            plan.add(occurrenceId, faceId(face), face, [(edgeId(edge), edge) for edge in face.selectedEdges])
+    return plans
+
+
+def _cylinderContains(outer, inner, tolerance=MERGE_TOLERANCE):
+    '''
+    True if cylinder inner ((start, end, radius)) lies completely inside cylinder outer
+    only parallel axes are considered - anything else is reported as not contained
+    '''
+    (outerStart, outerEnd, outerRadius), (innerStart, innerEnd, innerRadius) = outer, inner
+    if innerRadius > outerRadius + tolerance:
+        return False
+    ux, uy, uz = (outerEnd[i] - outerStart[i] for i in range(3))
+    length = sqrt(ux*ux + uy*uy + uz*uz)
+    if length < tolerance:
+        return False
+    ux, uy, uz = ux/length, uy/length, uz/length
+
+    vx, vy, vz = (innerEnd[i] - innerStart[i] for i in range(3))
+    innerLength = sqrt(vx*vx + vy*vy + vz*vz)
+    if innerLength >= tolerance:
+        cx, cy, cz = vy*uz - vz*uy, vz*ux - vx*uz, vx*uy - vy*ux
+        if cx*cx + cy*cy + cz*cz > (tolerance*innerLength)**2:
+            return False
+
+    # both end discs inside the outer cylinder - the inner one is their convex hull
+    for point in (innerStart, innerEnd):
+        px, py, pz = (point[i] - outerStart[i] for i in range(3))
+        along = px*ux + py*uy + pz*uz
+        if along < -tolerance or along > length + tolerance:
+            return False
+        dx, dy, dz = px - along*ux, py - along*uy, pz - along*uz
+        if sqrt(dx*dx + dy*dy + dz*dz) + innerRadius > outerRadius + tolerance:
+            return False
+    return True
+
+
+def mergeCylinders(cylinders, tolerance=MERGE_TOLERANCE):
+    '''
+    collapses coincident and fully contained tool cylinders
+    cylinders - [(start, end, radius), ...], points as (x, y, z)
+    candidates are found through a spatial hash of the (radius inflated) axis bounding boxes,
+    largest cylinders are placed first, so each one only has to be tested against possible containers
+    returns (kept indices in input order, {dropped index: index of the cylinder containing it})
+    '''
+    if not cylinders:
+        return [], {}
+    cellSize = max(2*radius for _, _, radius in cylinders) or 1.0
+
+    def cells(cylinder):
+        start, end, radius = cylinder
+        low = [int((min(start[i], end[i]) - radius)//cellSize) for i in range(3)]
+        high = [int((max(start[i], end[i]) + radius)//cellSize) for i in range(3)]
+        return [(x, y, z) for x in range(low[0], high[0] + 1)
+                          for y in range(low[1], high[1] + 1)
+                          for z in range(low[2], high[2] + 1)]
+
+    def volume(index):
+        start, end, radius = cylinders[index]
+        return sqrt(sum((end[i] - start[i])**2 for i in range(3)))*radius*radius
+
+    grid = {}
+    kept, dropped = [], {}
+    for index in sorted(range(len(cylinders)), key=lambda index: (-volume(index), index)):
+        cylinderCells = cells(cylinders[index])
+        candidates = sorted({other for cell in cylinderCells for other in grid.get(cell, ())})
+        container = next((other for other in candidates if _cylinderContains(cylinders[other], cylinders[index], tolerance)), None)
+        if container is not None:
+            dropped[index] = container
+            continue
+        kept.append(index)
+        for cell in cylinderCells:
+            grid.setdefault(cell, []).append(index)
+    return sorted(kept), dropped
+
+
+def mergeCollinear(cylinders, tolerance=MERGE_TOLERANCE):
+    '''
+    joins cylinders of the same radius and direction that share an axis line and whose ranges
+    along it overlap or touch - stacked dogbones of stepped pockets become one cylinder spanning them all
+    cylinders - [(start, end, radius), ...]
+    returns [(member indices, start, end), ...] covering every cylinder once - the first member
+    is the one starting at the start of the span
+    '''
+    lines = {}
+    for index, (start, end, radius) in enumerate(cylinders):
+        dx, dy, dz = (end[i] - start[i] for i in range(3))
+        length = sqrt(dx*dx + dy*dy + dz*dz)
+        if length < tolerance:
+            lines.setdefault(('point', index), []).append(index)
+            continue
+        direction = [dx/length, dy/length, dz/length]
+        along = sum(start[i]*direction[i] for i in range(3))
+        foot = [start[i] - along*direction[i] for i in range(3)]
+        lineKey = (tuple(round(c/tolerance) for c in direction), tuple(round(c/(tolerance*10)) for c in foot), round(radius/tolerance))
+        lines.setdefault(lineKey, []).append(index)
+
+    spans = []
+    for lineKey, members in lines.items():
+        if lineKey[0] == 'point':
+            spans.append((members, cylinders[members[0]][0], cylinders[members[0]][1]))
+            continue
+        direction = [c*tolerance for c in lineKey[0]]
+        norm = sqrt(sum(c*c for c in direction))
+        direction = [c/norm for c in direction]
+        ranges = sorted((sum(cylinders[index][0][i]*direction[i] for i in range(3)),
+                         sum(cylinders[index][1][i]*direction[i] for i in range(3)), index) for index in members)
+
+        groups = []
+        for low, high, index in ranges:
+            if groups and low <= groups[-1][1] + tolerance:
+                groups[-1][1] = max(groups[-1][1], high)
+                groups[-1][2].append(index)
+            else:
+                groups.append([low, high, [index]])
+
+        for low, high, group in groups:
+            # ranges were sorted by start, so the first member starts the span
+            start = cylinders[group[0]][0]
+            spans.append((group, tuple(start), tuple(start[i] + (high - low)*direction[i] for i in range(3))))
+    return spans
+
+
+def mergeAxes(axes, radius, tolerance=MERGE_TOLERANCE):
+    '''
+    drops coincident and contained tool cylinders and joins collinear ones (mergeCylinders, mergeCollinear)
+    axes - {edge: (start, end)} plain (non acute) dogbone axes, points as (x, y, z), edge any hashable key
+    the axis of an edge that takes over a joined span is replaced in axes
+    returns (set of edges whose dogbone is now cut by another one, number contained, number joined)
+    '''
+    edges = list(axes)
+    cylinders = [(axes[edge][0], axes[edge][1], radius) for edge in edges]
+    kept, dropped = mergeCylinders(cylinders, tolerance)
+    absorbed = {edges[i] for i in dropped}
+
+    joined = 0
+    for members, start, end in mergeCollinear([cylinders[i] for i in kept], tolerance):
+        if len(members) < 2:
+            continue
+        axes[edges[kept[members[0]]]] = (tuple(start), tuple(end))
+        absorbed.update(edges[kept[member]] for member in members[1:])
+        joined += len(members) - 1
+    return absorbed, len(dropped), joined
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+'''
+2D outline of the union of dogbone circles and clearance rectangles.
+
+All the dogbones of one face that share a depth can be cut with prisms of one outline in
+the face plane.  unionOutline works out that profile - the closed loops of
+lines and arcs bounding the union - from plain 2D coordinates.  No adsk imports, so the
+outline can be built and checked outside of Fusion.
+
+Method: every primitive boundary is split where it crosses another boundary, pieces whose
+midpoint lies inside another primitive are dropped, and the remaining pieces are chained
+end to start into loops.
+'''
+
+from dataclasses import dataclass
+from math import atan2, cos, sin, sqrt, pi
+
+PROFILE_TOLERANCE = 1e-7  # cm
+TWO_PI = 2*pi
+
+
+@dataclass(frozen=True)
+class Segment:
+    '''
+    Piece of an outline loop, from start to end
+    arcs have a centre and run counterclockwise from startAngle to endAngle (endAngle > startAngle)
+    '''
+    start: tuple
+    end: tuple
+    centre: tuple = None
+    radius: float = 0.0
+    startAngle: float = 0.0
+    endAngle: float = 0.0
+
+    @property
+    def isArc(self):
+        return self.centre is not None
+
+    @property
+    def sweep(self):
+        return self.endAngle - self.startAngle
+
+    def midpoint(self):
+        if self.isArc:
+            angle = (self.startAngle + self.endAngle)/2
+            return (self.centre[0] + self.radius*cos(angle), self.centre[1] + self.radius*sin(angle))
+        return ((self.start[0] + self.end[0])/2, (self.start[1] + self.end[1])/2)
+
+    def tangent(self):
+        '''
+        unit direction of travel at the midpoint
+        '''
+        if self.isArc:
+            angle = (self.startAngle + self.endAngle)/2
+            return (-sin(angle), cos(angle))
+        dx, dy = self.end[0] - self.start[0], self.end[1] - self.start[1]
+        length = sqrt(dx*dx + dy*dy)
+        return (dx/length, dy/length)
+
+
+def _arcPoint(centre, radius, angle):
+    return (centre[0] + radius*cos(angle), centre[1] + radius*sin(angle))
+
+
+def _counterClockwise(polygon):
+    area = sum(x0*y1 - x1*y0 for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1]))
+    return list(polygon) if area > 0 else list(polygon)[::-1]
+
+
+def _circleCircle(a, b, tolerance):
+    (ax, ay, ar), (bx, by, br) = a, b
+    dx, dy = bx - ax, by - ay
+    distance = sqrt(dx*dx + dy*dy)
+    if distance < tolerance or distance > ar + br + tolerance or distance < abs(ar - br) - tolerance:
+        return []
+    along = (distance*distance + ar*ar - br*br)/(2*distance)
+    height = sqrt(max(ar*ar - along*along, 0.0))
+    mx, my = ax + along*dx/distance, ay + along*dy/distance
+    return [(mx - height*dy/distance, my + height*dx/distance), (mx + height*dy/distance, my - height*dx/distance)]
+
+
+def _circleLine(circle, p0, p1, tolerance):
+    '''
+    intersections of a circle with the segment p0-p1, as (t along the segment, point)
+    '''
+    cx, cy, radius = circle
+    dx, dy = p1[0] - p0[0], p1[1] - p0[1]
+    fx, fy = p0[0] - cx, p0[1] - cy
+    a = dx*dx + dy*dy
+    b = 2*(fx*dx + fy*dy)
+    c = fx*fx + fy*fy - radius*radius
+    discriminant = b*b - 4*a*c
+    if a < tolerance*tolerance or discriminant < 0:
+        return []
+    root = sqrt(discriminant)
+    found = []
+    for t in ((-b - root)/(2*a), (-b + root)/(2*a)):
+        if -tolerance <= t <= 1 + tolerance:
+            found.append((min(max(t, 0.0), 1.0), (p0[0] + t*dx, p0[1] + t*dy)))
+    return found
+
+
+def _lineLine(p0, p1, q0, q1, tolerance):
+    '''
+    parameters (t, u) where segments p0-p1 and q0-q1 cross, None if parallel or apart
+    '''
+    rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+    sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+    denominator = rx*sy - ry*sx
+    if abs(denominator) < tolerance*tolerance:
+        return None
+    qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+    t = (qx*sy - qy*sx)/denominator
+    u = (qx*ry - qy*rx)/denominator
+    if -tolerance <= t <= 1 + tolerance and -tolerance <= u <= 1 + tolerance:
+        return min(max(t, 0.0), 1.0), min(max(u, 0.0), 1.0)
+    return None
+
+
+def _signedDistance(primitive, point):
+    '''
+    negative inside, positive outside, zero on the boundary
+    '''
+    x, y = point
+    if primitive[0] == 'circle':
+        cx, cy, radius = primitive[1]
+        return sqrt((x - cx)**2 + (y - cy)**2) - radius
+    distance = None
+    polygon = primitive[1]
+    for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1]):
+        ex, ey = x1 - x0, y1 - y0
+        length = sqrt(ex*ex + ey*ey)
+        edgeDistance = ((x - x0)*ey - (y - y0)*ex)/length  # right of a counterclockwise edge is outside
+        distance = edgeDistance if distance is None else max(distance, edgeDistance)
+    return distance
+
+
+def _boundaryTangent(primitive, point):
+    '''
+    counterclockwise boundary direction of the primitive at (or nearest to) point
+    '''
+    x, y = point
+    if primitive[0] == 'circle':
+        cx, cy, _ = primitive[1]
+        angle = atan2(y - cy, x - cx)
+        return (-sin(angle), cos(angle))
+    polygon = primitive[1]
+    best = None
+    for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1]):
+        ex, ey = x1 - x0, y1 - y0
+        length = sqrt(ex*ex + ey*ey)
+        distance = abs((x - x0)*ey - (y - y0)*ex)/length
+        if best is None or distance < best[0]:
+            best = (distance, (ex/length, ey/length))
+    return best[1]
+
+
+def _pieces(index, primitive, primitives, tolerance):
+    '''
+    the boundary of one primitive, split wherever another boundary crosses it
+    '''
+    kind, shape = primitive
+    if kind == 'circle':
+        cx, cy, radius = shape
+        angles = []
+        for otherIndex, (otherKind, other) in enumerate(primitives):
+            if otherIndex == index:
+                continue
+            if otherKind == 'circle':
+                points = _circleCircle(shape, other, tolerance)
+            else:
+                points = [point for p0, p1 in zip(other, other[1:] + other[:1]) for _, point in _circleLine(shape, p0, p1, tolerance)]
+            angles.extend(atan2(y - cy, x - cx) % TWO_PI for x, y in points)
+        angles = sorted(angles)
+        if not angles:
+            angles = [0.0, pi]  # an uncut circle is drawn as two half arcs
+        elif len(angles) == 1:
+            angles.append(angles[0] + pi)
+        pieces = []
+        for startAngle, endAngle in zip(angles, angles[1:] + [angles[0] + TWO_PI]):
+            if endAngle - startAngle < tolerance/radius:
+                continue
+            pieces.append(Segment(_arcPoint((cx, cy), radius, startAngle), _arcPoint((cx, cy), radius, endAngle),
+                                  (cx, cy), radius, startAngle, endAngle))
+        return pieces
+
+    pieces = []
+    for p0, p1 in zip(shape, shape[1:] + shape[:1]):
+        splits = [0.0, 1.0]
+        for otherIndex, (otherKind, other) in enumerate(primitives):
+            if otherIndex == index:
+                continue
+            if otherKind == 'circle':
+                splits.extend(t for t, _ in _circleLine(other, p0, p1, tolerance))
+            else:
+                for q0, q1 in zip(other, other[1:] + other[:1]):
+                    crossing = _lineLine(p0, p1, q0, q1, tolerance)
+                    if crossing:
+                        splits.append(crossing[0])
+        splits = sorted(set(splits))
+        length = sqrt((p1[0] - p0[0])**2 + (p1[1] - p0[1])**2)
+        points = [(p0[0] + t*(p1[0] - p0[0]), p0[1] + t*(p1[1] - p0[1])) for t in splits]
+        for (t0, start), (t1, end) in zip(zip(splits, points), zip(splits[1:], points[1:])):
+            if (t1 - t0)*length >= tolerance:
+                pieces.append(Segment(start, end))
+    return pieces
+
+
+def _onOutline(index, piece, primitives, tolerance):
+    '''
+    a piece stays if its midpoint is outside every other primitive - where two boundaries
+    coincide it is kept once if they run the same way, dropped if they face each other
+    '''
+    midpoint = piece.midpoint()
+    for otherIndex, other in enumerate(primitives):
+        if otherIndex == index:
+            continue
+        distance = _signedDistance(other, midpoint)
+        if distance < -tolerance:
+            return False
+        if distance <= tolerance:
+            tx, ty = piece.tangent()
+            ox, oy = _boundaryTangent(other, midpoint)
+            if tx*ox + ty*oy < 0 or otherIndex < index:
+                return False
+    return True
+
+
+def _chain(pieces, tolerance):
+    '''
+    joins pieces end to start into closed loops
+    '''
+    cell = tolerance*100
+    key = lambda point: (round(point[0]/cell), round(point[1]/cell))
+    starts = {}
+    for position, piece in enumerate(pieces):
+        starts.setdefault(key(piece.start), []).append(position)
+
+    used = set()
+    loops = []
+    for first in range(len(pieces)):
+        if first in used:
+            continue
+        loop = []
+        current = first
+        while current is not None and current not in used:
+            used.add(current)
+            loop.append(pieces[current])
+            end = key(pieces[current].end)
+            candidates = [other for offset in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+                          for other in starts.get((end[0] + offset[0], end[1] + offset[1]), ()) if other not in used]
+            current = candidates[0] if candidates else None
+        loops.append(loop)
+    return loops
+
+
+def unionOutline(circles=(), polygons=(), tolerance=PROFILE_TOLERANCE):
+    '''
+    outline of the union of circles ((cx, cy, radius)) and convex polygons ([(x, y), ...])
+    returns a list of closed loops, each a list of Segments - outer loops run counterclockwise,
+    loops around holes in the union clockwise
+    '''
+    primitives = []
+    seen = set()
+    for circle in circles:
+        circleKey = tuple(round(value/tolerance) for value in circle)
+        if circleKey not in seen and circle[2] > tolerance:
+            seen.add(circleKey)
+            primitives.append(('circle', tuple(circle)))
+    for polygon in polygons:
+        polygon = _counterClockwise([tuple(point) for point in polygon])
+        polygonKey = tuple(sorted(tuple(round(value/tolerance) for value in point) for point in polygon))
+        if polygonKey not in seen and len(polygon) >= 3:
+            seen.add(polygonKey)
+            primitives.append(('polygon', polygon))
+
+    pieces = [piece for index, primitive in enumerate(primitives)
+              for piece in _pieces(index, primitive, primitives, tolerance)
+              if _onOutline(index, piece, primitives, tolerance)]
+    return _chain(pieces, tolerance)
+
+
+def loopArea(loop):
+    '''
+    signed area enclosed by a loop - positive for counterclockwise loops
+    '''
+    area = 0.0
+    for segment in loop:
+        (x0, y0), (x1, y1) = segment.start, segment.end
+        area += (x0*y1 - x1*y0)/2
+        if segment.isArc:
+            # circular segment between the chord and the arc
+            area += segment.radius*segment.radius*(segment.sweep - sin(segment.sweep))/2
+    return area
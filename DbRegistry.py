@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+'''
+Registry of created dogbones, kept in the design as attributes.
+
+Every feature and sketch a dogbone run creates for one body is tagged in DOGBONEGROUP with the
+record id (ID), its revision id (REV_ID) and the record itself (RECORD): entity tokens of the
+source faces and edges, a signature of the source edge geometry and the parameters used.  The
+refresh command finds the records through design.findAttributes, works out the revision from
+the current geometry and the recorded parameters, and only rebuilds the records whose revision
+changed - with the parameters they were made with.
+No adsk imports: tokens and coordinates are supplied by the caller.
+'''
+
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+
+#constants - to keep attribute group and names consistent
+DOGBONEGROUP = 'dogBoneGroup'
+REV_ID = 'revId'
+ID = 'id'
+RECORD = 'record'
+
+# params that change the shape or placement of a dogbone - anything else (logging, dialog state) does not
+RECORD_PARAMS = ('toolDiaStr', 'toolDiaOffsetStr', 'dbType', 'fromTop', 'longSide', 'minimalPercent', 'parametric', 'holesPerFace')
+SIGNATURE_DIGITS = 6  # cm - rounding of edge end points
+
+
+def paramsKey(params)->dict:
+    return {name: getattr(params, name) for name in RECORD_PARAMS}
+
+
+def geometrySignature(edgePoints)->str:
+    '''
+    edgePoints - [((x, y, z), (x, y, z)), ...] end points of the source edges
+    independent of edge order and direction
+    '''
+    edges = sorted(tuple(sorted(tuple(round(value, SIGNATURE_DIGITS) + 0.0 for value in point) for point in points))
+                   for points in edgePoints)
+    return hashlib.sha1(repr(edges).encode('utf-8')).hexdigest()
+
+
+def revisionId(signature, params:dict)->str:
+    return hashlib.sha1(json.dumps([signature, params], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class DogboneRecord:
+    '''
+    what one dogbone run on one body was built from
+    '''
+    faceTokens: list
+    edgeTokens: list
+    signature: str
+    params: dict
+    recordId: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def revision(self)->str:
+        return revisionId(self.signature, self.params)
+
+    def isStale(self, signature, params:dict)->bool:
+        '''
+        signature - of the source edges as they are now, None if any of them can no longer be found
+        '''
+        return signature is None or revisionId(signature, params) != self.revision
+
+    def toJson(self)->str:
+        return json.dumps({'faceTokens': self.faceTokens,
+                           'edgeTokens': self.edgeTokens,
+                           'signature': self.signature,
+                           'params': self.params,
+                           'recordId': self.recordId})
+
+    @classmethod
+    def fromJson(cls, jsonString):
+        return cls(**json.loads(jsonString))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+'''
+Self-tuning choice of the static dogbone cutting strategy.
+
+Which route is quickest depends on the part: a prism of the dogbone outline per face (with
+single tool bodies for the rest) unioned and cut once, one union of every tool body and a
+single cut, or all tool bodies handed to one combine feature without a union.  Each run is timed and recorded against the
+size of the body (face count) and the number of corners, both bucketed by powers of two.  For a
+new job the strategy with the lowest running average in its bucket is picked - strategies
+that have not been measured in that bucket yet are tried first.  No adsk imports: the history
+is plain JSON, kept next to defaults.dat.
+'''
+
+import json
+import os
+
+PROFILE = 'profile'  # per face outline prisms, tool bodies for mixed depth faces - one combine cut
+UNION = 'union'  # every tool body unioned, one combine cut
+COMBINE = 'combine'  # every tool body passed to one combine cut, no union
+STRATEGIES = (PROFILE, UNION, COMBINE)
+
+HISTORY_WEIGHT = 10  # the running average follows roughly the last HISTORY_WEIGHT runs
+
+
+def sizeBucket(faceCount, cornerCount):
+    '''
+    jobs of about the same size share a bucket - powers of two of face and corner counts
+    '''
+    return f'{int(faceCount).bit_length()}:{int(cornerCount).bit_length()}'
+
+
+class StrategyHistory:
+    '''
+    running average of seconds per strategy and size bucket
+    {bucket: {strategy: [runs, average seconds]}}
+    '''
+    def __init__(self, path = None):
+        self.path = path
+        self.history = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='UTF-8') as historyFile:
+                    self.history = json.load(historyFile)
+            except (ValueError, OSError):
+                self.history = {}
+
+    def choose(self, faceCount, cornerCount):
+        timings = self.history.get(sizeBucket(faceCount, cornerCount), {})
+        untried = [strategy for strategy in STRATEGIES if strategy not in timings]
+        if untried:
+            return untried[0]
+        return min(STRATEGIES, key=lambda strategy: timings[strategy][1])
+
+    def record(self, strategy, faceCount, cornerCount, seconds):
+        timings = self.history.setdefault(sizeBucket(faceCount, cornerCount), {})
+        runs, average = timings.get(strategy, [0, 0.0])
+        runs += 1
+        average += (seconds - average)/min(runs, HISTORY_WEIGHT)
+        timings[strategy] = [runs, average]
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w', encoding='UTF-8') as historyFile:
+                json.dump(self.history, historyFile, indent=1)
+        except OSError:
+            pass
@@ -0,0 +1,670 @@
+# -*- coding: utf-8 -*-
+'''
+Flat-array snapshot of a body's B-Rep topology.
+
+All of the vertex, edge and face data needed for corner detection is pulled out of
+the Fusion API in a single pass, so that the detection itself never has to walk
+live API proxies.  The module deliberately has no adsk imports - a snapshot can be
+built from a live BRepBody (duck typed) or from plain coordinate arrays, which
+makes it possible to benchmark detection outside of Fusion.
+'''
+
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from math import sqrt, acos, pi, nan
+
+PLANE_TYPE = 'adsk::core::Plane'
+LINE_TYPE = 'adsk::core::Line3D'
+
+LENGTH_TOLERANCE = 1e-9
+DIRECTION_QUANTUM = 1e-6
+
+
+def quantizedDirection(x, y, z):
+    '''
+    integer grid key of a unit vector - equal keys mean equal directions (within DIRECTION_QUANTUM)
+    '''
+    return (round(x/DIRECTION_QUANTUM), round(y/DIRECTION_QUANTUM), round(z/DIRECTION_QUANTUM))
+
+
+def directionKey(x, y, z):
+    '''
+    canonical key of a unit vector - returns (key, antipodal)
+    key is the quantized direction, flipped so its first non zero component is positive - 
+    a direction and its opposite share the same key, antipodal is True for the flipped one.
+    Equal keys mean parallel, equal (key, antipodal) pairs mean the same direction.
+    '''
+    key = quantizedDirection(x, y, z)
+    for component in key:
+        if component:
+            if component < 0:
+                return (-key[0], -key[1], -key[2]), True
+            break
+    return key, False
+
+
+@dataclass(frozen=True)
+class CornerEdge:
+    '''
+    Candidate inside corner edge dropping down from a face
+    vertex/other are snapshot vertex indices - vertex is the end on the face
+    atStart is True when vertex is the startVertex of the edge
+    vectors are unit length tuples in body (native) space
+    '''
+    edge: int
+    vertex: int
+    other: int
+    atStart: bool
+    angle: float
+    cornerVector: tuple
+    edgeVector: tuple
+
+
+@dataclass(frozen=True)
+class FaceCorner:
+    '''
+    Vertex of a face loop with the two face edges meeting at it
+    incoming/outgoing are snapshot edge indices, in loop direction
+    lengths are the straight line distances between the edge ends
+    vectors are unit length tuples pointing away from the vertex along each edge
+    '''
+    vertex: int
+    incoming: int
+    outgoing: int
+    incomingLength: float
+    outgoingLength: float
+    incomingVector: tuple
+    outgoingVector: tuple
+
+    def side(self, edgeIndex):
+        '''
+        (length, vector) of the corner edge edgeIndex
+        '''
+        if edgeIndex == self.incoming:
+            return self.incomingLength, self.incomingVector
+        if edgeIndex == self.outgoing:
+            return self.outgoingLength, self.outgoingVector
+        raise KeyError(edgeIndex)
+
+
+class TopologySnapshot:
+    '''
+    Vertices, edges, face planes and adjacency of one body, held in flat arrays.
+    Faces are stored as loops of coEdges (CSR layout: offsets into flat arrays).
+    '''
+
+    def __init__(self):
+        self.vertexX = array('d')
+        self.vertexY = array('d')
+        self.vertexZ = array('d')
+
+        self.edgeStart = array('l')
+        self.edgeEnd = array('l')
+        self.edgeIsLine = array('b')
+        self.edgeFace0 = array('l')
+        self.edgeFace1 = array('l')
+        self.edgeOpposed0 = array('b')  # coEdge of edgeFace0 runs against the edge direction
+
+        self.faceIsPlane = array('b')
+        self.faceNX = array('d')
+        self.faceNY = array('d')
+        self.faceNZ = array('d')
+        self.faceLoopOffsets = array('l', [0])
+        self.loopCoEdgeOffsets = array('l', [0])
+        self.loopIsOuter = array('b')
+        self.coEdgeEdge = array('l')
+        self.coEdgeOpposed = array('b')
+
+        self.vertexEdgeOffsets = array('l')
+        self.vertexEdges = array('l')
+
+        # directionKey (key, antipodal) of every planar face normal and every linear edge (start -> end), else None
+        self.faceDirections = []
+        self.edgeDirections = []
+
+        # live API objects (None when built from plain arrays) and their tempId lookups
+        self.vertexEntities = []
+        self.edgeEntities = []
+        self.faceEntities = []
+        self.vertexIds = {}
+        self.edgeIds = {}
+        self.faceIds = {}
+
+        self._adjacency = None
+        self._heightIndex = None
+        self._cornerMaps = {}
+
+        self._edgeConcave = None
+        self._edgeAngles = None
+
+    @property
+    def vertexCount(self):
+        return len(self.vertexX)
+
+    @property
+    def edgeCount(self):
+        return len(self.edgeStart)
+
+    @property
+    def faceCount(self):
+        return len(self.faceIsPlane)
+
+    @classmethod
+    def fromBody(cls, body):
+        '''
+        builds the snapshot from a live (preferably native) BRepBody in one pass
+        '''
+        snapshot = cls()
+        vertexIds = snapshot.vertexIds
+        for vertex in body.vertices:
+            point = vertex.geometry
+            vertexIds[vertex.tempId] = len(snapshot.vertexX)
+            snapshot._addVertex(point.x, point.y, point.z, vertex)
+
+        for edge in body.edges:
+            snapshot.edgeIds[edge.tempId] = len(snapshot.edgeStart)
+            isLine = not edge.isDegenerate and edge.geometry.objectType == LINE_TYPE
+            snapshot._addEdge(vertexIds[edge.startVertex.tempId], vertexIds[edge.endVertex.tempId], isLine, edge)
+
+        for face in body.faces:
+            snapshot.faceIds[face.tempId] = len(snapshot.faceIsPlane)
+            normal = None
+            if face.geometry.objectType == PLANE_TYPE:
+                _, normal = face.evaluator.getNormalAtPoint(face.pointOnFace)
+                normal = (normal.x, normal.y, normal.z)
+            loops = [(loop.isOuter, [(snapshot.edgeIds[coEdge.edge.tempId], coEdge.isOpposedToEdge) for coEdge in loop.coEdges])
+                     for loop in face.loops]
+            snapshot._addFace(normal, loops, face)
+
+        snapshot._finalise()
+        return snapshot
+
+    @classmethod
+    def fromArrays(cls, vertices, faces):
+        '''
+        builds the snapshot from plain data - used for benchmarking without Fusion
+        vertices: [(x, y, z), ...]
+        faces: [(normal or None, [loop, ...]), ...] - each loop is an ordered list of vertex indices,
+               first loop is the outer loop. Edges are created as straight lines between consecutive loop vertices.
+        '''
+        snapshot = cls()
+        for x, y, z in vertices:
+            snapshot._addVertex(x, y, z)
+
+        edgeLookup = {}
+        for normal, vertexLoops in faces:
+            loops = []
+            for loopIndex, vertexLoop in enumerate(vertexLoops):
+                coEdges = []
+                for start, end in zip(vertexLoop, vertexLoop[1:] + vertexLoop[:1]):
+                    if (end, start) in edgeLookup:
+                        coEdges.append((edgeLookup[(end, start)], True))
+                        continue
+                    edgeLookup[(start, end)] = edgeIndex = snapshot.edgeCount
+                    snapshot._addEdge(start, end, True)
+                    coEdges.append((edgeIndex, False))
+                loops.append((loopIndex == 0, coEdges))
+            snapshot._addFace(normal, loops)
+
+        snapshot._finalise()
+        return snapshot
+
+    def _addVertex(self, x, y, z, entity=None):
+        self.vertexX.append(x)
+        self.vertexY.append(y)
+        self.vertexZ.append(z)
+        self.vertexEntities.append(entity)
+
+    def _addEdge(self, start, end, isLine, entity=None):
+        self.edgeStart.append(start)
+        self.edgeEnd.append(end)
+        self.edgeIsLine.append(isLine)
+        self.edgeFace0.append(-1)
+        self.edgeFace1.append(-1)
+        self.edgeOpposed0.append(False)
+        self.edgeEntities.append(entity)
+
+    def _addFace(self, normal, loops, entity=None):
+        faceIndex = len(self.faceIsPlane)
+        self.faceIsPlane.append(normal is not None)
+        nx, ny, nz = normal if normal else (0.0, 0.0, 0.0)
+        self.faceNX.append(nx)
+        self.faceNY.append(ny)
+        self.faceNZ.append(nz)
+        for isOuter, coEdges in loops:
+            for edgeIndex, opposed in coEdges:
+                self.coEdgeEdge.append(edgeIndex)
+                self.coEdgeOpposed.append(opposed)
+                if self.edgeFace0[edgeIndex] < 0:
+                    self.edgeFace0[edgeIndex] = faceIndex
+                    self.edgeOpposed0[edgeIndex] = opposed
+                elif self.edgeFace0[edgeIndex] != faceIndex:
+                    self.edgeFace1[edgeIndex] = faceIndex
+            self.loopIsOuter.append(isOuter)
+            self.loopCoEdgeOffsets.append(len(self.coEdgeEdge))
+        self.faceLoopOffsets.append(len(self.loopIsOuter))
+        self.faceEntities.append(entity)
+
+    def _finalise(self):
+        '''
+        builds the vertex -> edges adjacency (CSR) from the edge arrays and
+        computes the direction keys of faces and edges
+        '''
+        self.faceDirections = [directionKey(self.faceNX[i], self.faceNY[i], self.faceNZ[i]) if self.faceIsPlane[i] else None
+                               for i in range(self.faceCount)]
+        self.edgeDirections = []
+        for start, end, isLine in zip(self.edgeStart, self.edgeEnd, self.edgeIsLine):
+            ex = self.vertexX[end] - self.vertexX[start]
+            ey = self.vertexY[end] - self.vertexY[start]
+            ez = self.vertexZ[end] - self.vertexZ[start]
+            length = sqrt(ex*ex + ey*ey + ez*ez)
+            self.edgeDirections.append(directionKey(ex/length, ey/length, ez/length) if isLine and length >= LENGTH_TOLERANCE else None)
+
+        counts = [0]*(self.vertexCount + 1)
+        for start, end in zip(self.edgeStart, self.edgeEnd):
+            counts[start + 1] += 1
+            counts[end + 1] += 1
+        for i in range(self.vertexCount):
+            counts[i + 1] += counts[i]
+        self.vertexEdgeOffsets = array('l', counts)
+        fill = counts[:-1]
+        edges = [0]*counts[-1]
+        for edgeIndex, (start, end) in enumerate(zip(self.edgeStart, self.edgeEnd)):
+            edges[fill[start]] = edgeIndex
+            fill[start] += 1
+            edges[fill[end]] = edgeIndex
+            fill[end] += 1
+        self.vertexEdges = array('l', edges)
+
+    def faceIndex(self, face):
+        '''
+        snapshot index of a live (native) BRepFace
+        '''
+        return self.faceIds[face.tempId]
+
+    def edgeIndex(self, edge):
+        '''
+        snapshot index of a live (native) BRepEdge
+        '''
+        return self.edgeIds[edge.tempId]
+
+    def vertexIndex(self, vertex):
+        '''
+        snapshot index of a live (native) BRepVertex
+        '''
+        return self.vertexIds[vertex.tempId]
+
+    @property
+    def adjacency(self):
+        '''
+        set based adjacency index - built on first use
+        '''
+        if self._adjacency is None:
+            self._adjacency = AdjacencyIndex(self)
+        return self._adjacency
+
+    @property
+    def heightIndex(self):
+        '''
+        planar faces bucketed by normal direction, sorted by offset - built on first use
+        '''
+        if self._heightIndex is None:
+            self._heightIndex = HeightIndex(self)
+        return self._heightIndex
+
+    def faceNormal(self, faceIndex):
+        return (self.faceNX[faceIndex], self.faceNY[faceIndex], self.faceNZ[faceIndex])
+
+    def point(self, vertexIndex):
+        return (self.vertexX[vertexIndex], self.vertexY[vertexIndex], self.vertexZ[vertexIndex])
+
+    def faceCoEdges(self, faceIndex):
+        '''
+        range of coEdge indices belonging to all loops of the face
+        '''
+        loopStart, loopEnd = self.faceLoopOffsets[faceIndex], self.faceLoopOffsets[faceIndex + 1]
+        return range(self.loopCoEdgeOffsets[loopStart], self.loopCoEdgeOffsets[loopEnd])
+
+    def faceEdges(self, faceIndex):
+        return {self.coEdgeEdge[i] for i in self.faceCoEdges(faceIndex)}
+
+    def faceVertices(self, faceIndex):
+        vertices = set()
+        for i in self.faceCoEdges(faceIndex):
+            edgeIndex = self.coEdgeEdge[i]
+            vertices.add(self.edgeStart[edgeIndex])
+            vertices.add(self.edgeEnd[edgeIndex])
+        return vertices
+
+    def faceCornerMap(self, faceIndex):
+        '''
+        {vertex index: FaceCorner} for every vertex of the face - built by walking the face loops once, then cached
+        '''
+        cornerMap = self._cornerMaps.get(faceIndex)
+        if cornerMap is not None:
+            return cornerMap
+
+        incoming, outgoing = {}, {}
+        for coEdge in self.faceCoEdges(faceIndex):
+            edgeIndex = self.coEdgeEdge[coEdge]
+            start, end = self.edgeStart[edgeIndex], self.edgeEnd[edgeIndex]
+            if self.coEdgeOpposed[coEdge]:
+                start, end = end, start
+            outgoing[start] = edgeIndex
+            incoming[end] = edgeIndex
+
+        def side(vertex, edgeIndex):
+            start, end = self.edgeStart[edgeIndex], self.edgeEnd[edgeIndex]
+            other = end if start == vertex else start
+            ex = self.vertexX[other] - self.vertexX[vertex]
+            ey = self.vertexY[other] - self.vertexY[vertex]
+            ez = self.vertexZ[other] - self.vertexZ[vertex]
+            length = sqrt(ex*ex + ey*ey + ez*ez)
+            return length, ((ex/length, ey/length, ez/length) if length >= LENGTH_TOLERANCE else (0.0, 0.0, 0.0))
+
+        cornerMap = self._cornerMaps[faceIndex] = {}
+        for vertex, outgoingEdge in outgoing.items():
+            incomingEdge = incoming.get(vertex)
+            if incomingEdge is None:
+                continue
+            incomingLength, incomingVector = side(vertex, incomingEdge)
+            outgoingLength, outgoingVector = side(vertex, outgoingEdge)
+            cornerMap[vertex] = FaceCorner(vertex, incomingEdge, outgoingEdge,
+                                           incomingLength, outgoingLength, incomingVector, outgoingVector)
+        return cornerMap
+
+    def edgesAtVertex(self, vertexIndex):
+        return self.vertexEdges[self.vertexEdgeOffsets[vertexIndex]:self.vertexEdgeOffsets[vertexIndex + 1]]
+
+    def classifyEdges(self, edgeIndices=None):
+        '''
+        returns (concave, angles) for the given edges (default: every edge of the body) in one pass
+        angles are radians between the two planar faces, measured through the material - < pi is an inside corner
+        edges that are not between two planar faces get nan and concave = False
+        '''
+        edgeIndices = range(self.edgeCount) if edgeIndices is None else edgeIndices
+        vx, vy, vz = self.vertexX, self.vertexY, self.vertexZ
+        nx, ny, nz = self.faceNX, self.faceNY, self.faceNZ
+        isPlane = self.faceIsPlane
+        edgeStart, edgeEnd, opposed0 = self.edgeStart, self.edgeEnd, self.edgeOpposed0
+        edgeFace0, edgeFace1 = self.edgeFace0, self.edgeFace1
+
+        concave = array('b')
+        angles = array('d')
+        for edgeIndex in edgeIndices:
+            face0, face1 = edgeFace0[edgeIndex], edgeFace1[edgeIndex]
+            if face0 < 0 or face1 < 0 or not (isPlane[face0] and isPlane[face1]):
+                concave.append(False)
+                angles.append(nan)
+                continue
+            n0x, n0y, n0z = nx[face0], ny[face0], nz[face0]
+            n1x, n1y, n1z = nx[face1], ny[face1], nz[face1]
+            normalAngle = acos(max(-1.0, min(1.0, n0x*n1x + n0y*n1y + n0z*n1z)))
+
+            # edge direction as seen by the coEdge of face0
+            start, end = (edgeEnd[edgeIndex], edgeStart[edgeIndex]) if opposed0[edgeIndex] \
+                else (edgeStart[edgeIndex], edgeEnd[edgeIndex])
+
+            # normal1 x normal0 - if opposed to the coEdge direction it's a convex angle
+            isConvex = (vx[end] - vx[start])*(n1y*n0z - n1z*n0y) \
+                     + (vy[end] - vy[start])*(n1z*n0x - n1x*n0z) \
+                     + (vz[end] - vz[start])*(n1x*n0y - n1y*n0x) < 0
+            concave.append(not isConvex)
+            angles.append(pi + normalAngle if isConvex else pi - normalAngle)
+        return concave, angles
+
+    @property
+    def edgeAngles(self):
+        '''
+        corner angle of every edge of the body - classified on first use
+        '''
+        if self._edgeAngles is None:
+            self._edgeConcave, self._edgeAngles = self.classifyEdges()
+        return self._edgeAngles
+
+    def dihedralAngle(self, edgeIndex):
+        return self.edgeAngles[edgeIndex]
+
+    def faceCorners(self, faceIndex):
+        '''
+        returns CornerEdge for every linear edge that drops down (against the face normal)
+        from a vertex of the face, and whose adjacent faces are both planar
+        '''
+        if self.faceDirections[faceIndex] is None:
+            return []
+        faceKey, faceAntipodal = self.faceDirections[faceIndex]
+        edgeAngles = self.edgeAngles
+        faceEdges = self.adjacency.faceEdges[faceIndex]
+        faceVertices = self.adjacency.faceVertices[faceIndex]
+        processedEdges = set()
+        corners = []
+
+        for vertexIndex in faceVertices:
+            for edgeIndex in self.edgesAtVertex(vertexIndex):
+                if edgeIndex in faceEdges or edgeIndex in processedEdges:
+                    continue
+                processedEdges.add(edgeIndex)
+                # must be linear and parallel to the face normal
+                edgeDirection = self.edgeDirections[edgeIndex]
+                if edgeDirection is None or edgeDirection[0] != faceKey:
+                    continue
+                face0, face1 = self.edgeFace0[edgeIndex], self.edgeFace1[edgeIndex]
+                if face0 < 0 or face1 < 0 or not (self.faceIsPlane[face0] and self.faceIsPlane[face1]):
+                    continue
+
+                # vector pointing out from the face vertex must point away from the face normal
+                start, end = self.edgeStart[edgeIndex], self.edgeEnd[edgeIndex]
+                vertex, other = (end, start) if end in faceVertices else (start, end)
+                if (edgeDirection[1] != (vertex == end)) == faceAntipodal:
+                    continue
+                ex = self.vertexX[other] - self.vertexX[vertex]
+                ey = self.vertexY[other] - self.vertexY[vertex]
+                ez = self.vertexZ[other] - self.vertexZ[vertex]
+                length = sqrt(ex*ex + ey*ey + ez*ez)
+                ex, ey, ez = ex/length, ey/length, ez/length
+
+                n0, n1 = self.faceNormal(face0), self.faceNormal(face1)
+                vx, vy, vz = n0[0] + n1[0], n0[1] + n1[1], n0[2] + n1[2]
+                vLength = sqrt(vx*vx + vy*vy + vz*vz) or 1.0
+
+                corners.append(CornerEdge(edge=edgeIndex,
+                                          vertex=vertex,
+                                          other=other,
+                                          atStart=vertex == start,
+                                          angle=edgeAngles[edgeIndex],
+                                          cornerVector=(vx/vLength, vy/vLength, vz/vLength),
+                                          edgeVector=(ex, ey, ez)))
+        return corners
+
+    def facesByDirection(self):
+        '''
+        planar faces grouped by the direction key of their normal (parallel and anti-parallel together)
+        '''
+        grouped = {}
+        for faceIndex, direction in enumerate(self.faceDirections):
+            if direction is not None:
+                grouped.setdefault(direction[0], []).append(faceIndex)
+        return grouped
+
+    def edgesByDirection(self):
+        '''
+        linear edges grouped by the direction key of their edge vector (parallel and anti-parallel together)
+        '''
+        grouped = {}
+        for edgeIndex, direction in enumerate(self.edgeDirections):
+            if direction is not None:
+                grouped.setdefault(direction[0], []).append(edgeIndex)
+        return grouped
+
+    def bodyCorners(self, directions=None):
+        '''
+        finds every concave linear edge of the body in one pass over the classified edges and
+        assigns it to the planar floor face it drops down from
+        directions: optional set of directionKey pairs - only floors with these normals are returned
+        returns {floor normal directionKey: {faceIndex: [CornerEdge, ...]}}
+        '''
+        edgeAngles = self.edgeAngles
+        concave = self._edgeConcave
+        adjacency = self.adjacency
+        vx, vy, vz = self.vertexX, self.vertexY, self.vertexZ
+        nx, ny, nz = self.faceNX, self.faceNY, self.faceNZ
+        faceDirections = self.faceDirections
+        grouped = {}
+
+        for edgeIndex, edgeDirection in enumerate(self.edgeDirections):
+            if edgeDirection is None or not concave[edgeIndex]:
+                continue
+            edgeKey, edgeAntipodal = edgeDirection
+            face0, face1 = self.edgeFace0[edgeIndex], self.edgeFace1[edgeIndex]
+            start, end = self.edgeStart[edgeIndex], self.edgeEnd[edgeIndex]
+            ex, ey, ez = vx[end] - vx[start], vy[end] - vy[start], vz[end] - vz[start]
+            length = sqrt(ex*ex + ey*ey + ez*ez)
+            ex, ey, ez = ex/length, ey/length, ez/length
+
+            cornerVector = None
+            for vertex, other, sign in ((start, end, 1.0), (end, start, -1.0)):
+                # a floor normal has the edge key, but points the opposite way to the edge running away from the floor
+                floorDirection = (edgeKey, edgeAntipodal if sign < 0 else not edgeAntipodal)
+                if directions is not None and floorDirection not in directions:
+                    continue
+                for faceIndex in adjacency.vertexFaces[vertex]:
+                    if faceDirections[faceIndex] != floorDirection or faceIndex == face0 or faceIndex == face1:
+                        continue
+                    if edgeIndex in adjacency.faceEdges[faceIndex] or other in adjacency.faceVertices[faceIndex]:
+                        continue
+                    dx, dy, dz = sign*ex, sign*ey, sign*ez
+                    if cornerVector is None:
+                        wx, wy, wz = nx[face0] + nx[face1], ny[face0] + ny[face1], nz[face0] + nz[face1]
+                        wLength = sqrt(wx*wx + wy*wy + wz*wz) or 1.0
+                        cornerVector = (wx/wLength, wy/wLength, wz/wLength)
+                    grouped.setdefault(floorDirection, {}).setdefault(faceIndex, []).append(
+                        CornerEdge(edge=edgeIndex,
+                                   vertex=vertex,
+                                   other=other,
+                                   atStart=vertex == start,
+                                   angle=edgeAngles[edgeIndex],
+                                   cornerVector=cornerVector,
+                                   edgeVector=(dx, dy, dz)))
+        return grouped
+
+
+class AdjacencyIndex:
+    '''
+    Per-body adjacency sets: vertex -> edges, vertex -> faces, face -> vertices, face -> edges, edge -> faces.
+    Everything is keyed by interned ids (snapshot indices); live native entities are
+    interned through their tempId, so membership tests are O(1) set lookups instead of
+    linear scans over API collections.
+    Lookups raise KeyError for entities that are not part of the snapshot (eg. after a recompute)
+    '''
+
+    def __init__(self, snapshot:TopologySnapshot):
+        self.snapshot = snapshot
+        self.vertexEdges = [frozenset(snapshot.edgesAtVertex(vertexIndex)) for vertexIndex in range(snapshot.vertexCount)]
+        self.faceVertices = [frozenset(snapshot.faceVertices(faceIndex)) for faceIndex in range(snapshot.faceCount)]
+        self.faceEdges = [frozenset(snapshot.faceEdges(faceIndex)) for faceIndex in range(snapshot.faceCount)]
+        vertexFaces = [set() for _ in range(snapshot.vertexCount)]
+        for faceIndex, faceVertices in enumerate(self.faceVertices):
+            for vertexIndex in faceVertices:
+                vertexFaces[vertexIndex].add(faceIndex)
+        self.vertexFaces = [frozenset(faces) for faces in vertexFaces]
+        self.edgeFaces = [frozenset(faceIndex for faceIndex in faces if faceIndex >= 0)
+                          for faces in zip(snapshot.edgeFace0, snapshot.edgeFace1)]
+
+    def _ids(self, edge, face):
+        snapshot = self.snapshot
+        return snapshot.edgeIds[edge.tempId], snapshot.faceIds[face.tempId]
+
+    def isVertexOfFace(self, vertex, face)->bool:
+        return self.snapshot.vertexIds[vertex.tempId] in self.faceVertices[self.snapshot.faceIds[face.tempId]]
+
+    def isStartOnFace(self, edge, face)->bool:
+        edgeId, faceId = self._ids(edge, face)
+        return self.snapshot.edgeStart[edgeId] in self.faceVertices[faceId]
+
+    def isEndOnFace(self, edge, face)->bool:
+        edgeId, faceId = self._ids(edge, face)
+        return self.snapshot.edgeEnd[edgeId] in self.faceVertices[faceId]
+
+    def isEdgeAtFace(self, edge, face)->bool:
+        '''
+        True if either end of the edge is a vertex of the face
+        '''
+        edgeId, faceId = self._ids(edge, face)
+        faceVertices = self.faceVertices[faceId]
+        return self.snapshot.edgeStart[edgeId] in faceVertices or self.snapshot.edgeEnd[edgeId] in faceVertices
+
+
+class HeightIndex:
+    '''
+    Planar faces of a body bucketed by (antipodal) normal direction, each bucket sorted by the
+    signed offset of the face plane along the bucket direction.
+    Top face and "faces at the same depth" queries become a bucket lookup plus a binary search.
+    Built on the native body, so it is shared by all occurrences of a component.
+    '''
+
+    def __init__(self, snapshot:TopologySnapshot):
+        self.snapshot = snapshot
+        self.faceKeys = {}
+        self.faceOffsets = {} # along the bucket direction
+        buckets = {}
+        for faceIndex in range(snapshot.faceCount):
+            if not snapshot.faceIsPlane[faceIndex]:
+                continue
+            key, antipodal = snapshot.faceDirections[faceIndex]
+            sign = -1 if antipodal else 1
+            dx, dy, dz = (component*DIRECTION_QUANTUM for component in key)
+            length = sqrt(dx*dx + dy*dy + dz*dz)
+            x, y, z = snapshot.point(snapshot.edgeStart[snapshot.coEdgeEdge[snapshot.faceCoEdges(faceIndex)[0]]])
+            self.faceKeys[faceIndex] = (key, sign)
+            self.faceOffsets[faceIndex] = offset = (dx*x + dy*y + dz*z)/length
+            buckets.setdefault(key, []).append((offset, faceIndex))
+
+        self.offsets = {}
+        self.faces = {}
+        for key, entries in buckets.items():
+            entries.sort()
+            self.offsets[key] = [offset for offset, _ in entries]
+            self.faces[key] = [faceIndex for _, faceIndex in entries]
+
+    def offset(self, faceIndex):
+        '''
+        signed offset of the face plane along the face's own normal
+        '''
+        return self.faceKeys[faceIndex][1]*self.faceOffsets[faceIndex]
+
+    def topFace(self, faceIndex):
+        '''
+        the parallel face furthest along the face's own normal
+        '''
+        key, sign = self.faceKeys[faceIndex]
+        return self.faces[key][-1] if sign > 0 else self.faces[key][0]
+
+    def facesAtOffset(self, faceIndex, offset, tolerance=1e-6):
+        '''
+        faces parallel to faceIndex whose plane lies at offset (measured along the normal of faceIndex)
+        '''
+        key, sign = self.faceKeys[faceIndex]
+        offsets = self.offsets[key]
+        lo = bisect_left(offsets, sign*offset - tolerance)
+        hi = bisect_right(offsets, sign*offset + tolerance)
+        return self.faces[key][lo:hi]
+
+    def facesAtSameDepth(self, faceIndex, tolerance=1e-6):
+        return self.facesAtOffset(faceIndex, self.offset(faceIndex), tolerance)
+
+
+def angleWindowMask(angles, params):
+    '''
+    returns a list of bools - True where the radian corner angle is inside the detection window
+    set by params (acuteAngle, obtuseAngle, minAngleLimit, maxAngleLimit in degrees, parametric)
+    '''
+    toDegrees = 180/pi
+    minLimit, maxLimit = params.minAngleLimit, params.maxAngleLimit
+    if params.parametric or not (params.acuteAngle or params.obtuseAngle):
+        return [abs(angle*toDegrees - 90) <= 0.001 for angle in angles]
+    if params.acuteAngle and params.obtuseAngle:
+        return [minLimit < angle*toDegrees < maxLimit for angle in angles]
+    if params.acuteAngle:
+        return [minLimit < angle*toDegrees <= 90 for angle in angles]
+    return [90 <= angle*toDegrees < maxLimit for angle in angles]
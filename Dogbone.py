@@ -32,22 +32,28 @@ from collections import defaultdict
 import math
 import traceback
 import json
+import dataclasses
+import threading
 
 import time
 from . import dbutils as dbUtils
 from .decorators import eventHandler, parseDecorator
 from math import sqrt as sqrt
-from .DbClasses import DbFace, DbEdge
+from .DbClasses import DbFace, DbEdge, toolBodyCache
 from .DbData import DbParams
+from .DbTopology import TopologySnapshot
+from .DbBoolean import spatialOrder, balancedUnion
+from .DbPlanning import planDogbones, mergeAxes as mergeEdgeAxes
+from .DbProfile import unionOutline, loopArea
+from .DbStrategy import StrategyHistory, PROFILE, COMBINE
+from .DbRegistry import DogboneRecord, DOGBONEGROUP, REV_ID, ID, RECORD, paramsKey, geometrySignature
 
 
-#constants - to keep attribute group and names consistent
-DOGBONEGROUP = 'dogBoneGroup'
-# FACE_ID = 'faceID'
-REV_ID = 'revId'
-ID = 'id'
 DEBUGLEVEL = logging.NOTSET
 
+REFILTER_EVENT_ID = 'dogboneRefilterEvent'
+REFILTER_DELAY = 0.2 # seconds of slider inactivity before edges are refiltered
+
 
 
 calcId = lambda x: hash(x.entityToken) # if x.assemblyContext else str(x.tempId) + ':' + x.body.name
@@ -57,7 +63,7 @@ reValidateFace = lambda comp, x: comp.findBRepUsingPoint(x, adsk.fusion.BRepEnti
 
 class DogboneCommand(object):
     COMMAND_ID = "dogboneBtn"
-    # REFRESH_COMMAND_ID = "refreshDogboneBtn"
+    REFRESH_COMMAND_ID = "refreshDogboneBtn"
     
     param = DbParams()
     registeredEdgesDict = {}
@@ -68,16 +74,21 @@ class DogboneCommand(object):
     selectedOccurrences = {} #key hash(occurrence.entityToken) value:[DbFace,...]
     selectedFaces = {} #key: hash(face.entityToken) value:[DbFace,...]
     selectedEdges = {} #kay: hash(edge.entityToken) value:[DbEdge, ...]
+    topologySnapshots = {} #key: hash(nativeBody.entityToken) value: TopologySnapshot
+    selectableFaces = {} #key: hash(occurrence.entityToken) value: {hash(face.entityToken), ...} faces parallel to the primary face
 
     def __init__(self):
 
         self.faceSelections = adsk.core.ObjectCollection.create()
         self.param = DbParams()
+        self.refilterTimer = None
+        self.addingFaces = False
         self.loggingLevels = {'Notset':0,'Debug':10,'Info':20,'Warning':30,'Error':40}
 
         self.levels = {}
         self.initLogger()
         _appPath = os.path.dirname(os.path.abspath(__file__))
+        self.strategyHistory = StrategyHistory(os.path.join(_appPath, 'strategies.dat'))
         
 
     def writeDefaults(self):
@@ -104,6 +115,131 @@ class DogboneCommand(object):
             json_file.close()
             self.param = DbParams()
             
+    def resetSessionCaches(self):
+        '''
+        topology snapshots, face normals and tool body templates are only valid while the design and params are unchanged
+        - called at the start and end of every command session and after dogbones are created
+        placed tool bodies are keyed by their geometry, so the tool body memo is kept for the next run
+        '''
+        self.topologySnapshots = {}
+        dbUtils.faceGeometryCache.clear()
+        toolBodyCache.clear()
+
+    def topologySnapshot(self, entity)->TopologySnapshot:
+        '''
+        returns the topology snapshot of the native body the entity belongs to - built once per command session
+        '''
+        native = makeNative(entity)
+        body = native if native.objectType == adsk.fusion.BRepBody.classType() else native.body
+        bodyId = hash(body.entityToken)
+        snapshot = self.topologySnapshots.get(bodyId)
+        if not snapshot:
+            startTime = time.time()
+            snapshot = self.topologySnapshots[bodyId] = TopologySnapshot.fromBody(body)
+            self.logger.debug(f'topology snapshot of {body.name}: {snapshot.faceCount} faces, {snapshot.edgeCount} edges in {time.time() - startTime:.03f} sec')
+        return snapshot
+
+    def faceDirection(self, face):
+        '''
+        directionKey (key, antipodal) of the face normal, from the topology snapshot - None if not planar
+        faces are parallel when their keys are equal
+        '''
+        snapshot = self.topologySnapshot(face)
+        return snapshot.faceDirections[snapshot.faceIndex(makeNative(face))]
+
+    def updateSelectableFaces(self, occurrenceId):
+        '''
+        recomputes the faces still selectable in an occurrence (or root body) - those parallel to its primary face
+        called whenever a face is added or removed, so onFaceSelect only does membership tests
+        '''
+        faces = [face for face in self.selectedOccurrences.get(occurrenceId, []) if face.isSelected]
+        if faces:
+            primaryFace = faces[0].face
+            key = self.faceDirection(primaryFace)[0]
+            occurrence = primaryFace.assemblyContext
+            selectable = set()
+            for body in (occurrence.bRepBodies if occurrence else [primaryFace.body]):
+                snapshot = self.topologySnapshot(body)
+                for faceIndex in snapshot.facesByDirection().get(key, []):
+                    face = snapshot.faceEntities[faceIndex]
+                    selectable.add(calcId(face.createForAssemblyContext(occurrence) if occurrence else face))
+            self.selectableFaces[occurrenceId] = selectable
+        else:
+            self.selectableFaces.pop(occurrenceId, None)
+
+    def dogbonePlans(self):
+        '''
+        the current selection grouped by native body and face direction (see DbPlanning) - native edges picked
+        through several occurrences of a component are only planned once
+        '''
+        plans = planDogbones(self.selectedOccurrences,
+                             bodyId = lambda face: hash(face.native.body.entityToken),
+                             faceId = lambda face: hash(face.native.entityToken),
+                             edgeId = lambda edge: hash(edge.native.entityToken),
+                             directionId = lambda face: self.faceDirection(face.native))
+        for plan in plans.values():
+            self.logger.debug(f'plan: {len(plan.faces)} faces, {plan.edgeCount} edges from {len(plan.occurrenceIds)} occurrences, {plan.duplicateEdges} duplicates skipped')
+        return plans
+
+    def addBodyCorners(self, entity):
+        '''
+        adds every face with inside corner edges dropping down from it, for each solid body of entity (body or occurrence)
+        if faces of a body are already selected, only floors parallel to them are added - otherwise only the floors
+        of the drop direction with the most corners
+        '''
+        faceSelect = self.commandInputs.itemById('faceSelect')
+        edgeSelect = self.commandInputs.itemById('edgeSelect')
+        bodies = [entity] if entity.objectType == adsk.fusion.BRepBody.classType() else list(entity.bRepBodies)
+
+        self.addingFaces = True
+        try:
+            for body in bodies:
+                if not body.isSolid:
+                    continue
+                snapshot = self.topologySnapshot(body)
+                occurrenceId = hash(body.assemblyContext.entityToken) if body.assemblyContext else hash(body.entityToken)
+                faces = self.selectedOccurrences.get(occurrenceId, [])
+                directions = {self.faceDirection(face.face) for face in faces} or None
+
+                startTime = time.time()
+                grouped = snapshot.bodyCorners(directions)
+                self.logger.debug(f'{body.name}: {sum(len(floors) for floors in grouped.values())} floor faces found in {time.time() - startTime:.03f} sec')
+                if not grouped:
+                    continue
+
+                # the faces of an occurrence are parallel (see updateSelectableFaces) - with none selected yet,
+                # only the drop direction with the most corners is added
+                if directions is None:
+                    direction = max(grouped, key=lambda key: sum(len(corners) for corners in grouped[key].values()))
+                    grouped = {direction: grouped[direction]}
+
+                for floors in grouped.values():
+                    for faceIndex, corners in floors.items():
+                        face = snapshot.faceEntities[faceIndex]
+                        if body.assemblyContext:
+                            face = face.createForAssemblyContext(body.assemblyContext)
+                        faceId = calcId(face)
+                        if faceId in self.selectedFaces:
+                            continue
+                        dbFace = DbFace(parent = self,
+                                        face = face,
+                                        params = self.param,
+                                        commandInputsEdgeSelect = edgeSelect,
+                                        corners = corners)
+                        faces.append(dbFace)
+                        self.selectedFaces[faceId] = dbFace
+                        faceSelect.addSelection(face)
+                        dbFace.selectAll()
+                if faces:
+                    self.selectedOccurrences[occurrenceId] = faces
+                    self.updateSelectableFaces(occurrenceId)
+        finally:
+            self.addingFaces = False
+
+        if len(self.selectedFaces):
+            edgeSelect.isVisible = True
+        faceSelect.hasFocus = True
+
     def debugFace(self, face):
         if  self.logger.level < logging.DEBUG:
             return
@@ -112,38 +248,44 @@ class DogboneCommand(object):
 
         return
 
-    # def addRefreshButton(self):
-    #     try:
-    #     # clean up any crashed instances of the button if existing
-    #         self.removeButton()
-    #     except:
-    #         pass
-
-    #     # Create button definition and command event handler
-    #     refreshButtonDogbone = _ui.commandDefinitions.addButtonDefinition(
-    #         self.REFRESH_COMMAND_ID, 
-    #         'DogboneRefresh', 
-    #         'Refreshes already created dogbones', 
-    #         'Resources')
-
-    #     self.onRefreshCreate(event=refreshButtonDogbone.commandCreated)
-    #     # Create controls for Manufacturing Workspace
-    #     mfgEnv = _ui.workspaces.itemById('MfgWorkingModelEnv')
-    #     mfgTab = mfgEnv.toolbarTabs.itemById('MfgSolidTab')
-    #     mfgSolidPanel = mfgTab.toolbarPanels.itemById('SolidCreatePanel')
-    #     buttonControlMfg = mfgSolidPanel.controls.addCommand(refreshButtonDogbone, 'refreshDogboneBtn')
-
-    #     # Make the button available in the Mfg panel.
-    #     buttonControlMfg.isPromotedByDefault = True
-    #     buttonControlMfg.isPromoted = True
-
-    #     # Create controls for the Design Workspace
-    #     createPanel = _ui.allToolbarPanels.itemById('SolidCreatePanel')
-    #     buttonControl = createPanel.controls.addCommand(refreshButtonDogbone, 'refreshDogboneBtn')
-
-    #     # Make the button available in the panel.
-    #     buttonControl.isPromotedByDefault = True
-    #     buttonControl.isPromoted = True
+    def addRefreshButton(self):
+        try:
+        # clean up any crashed instances of the button if existing
+            self.removeRefreshButton()
+        except:
+            pass
+
+        # Create button definition and command event handler
+        refreshButtonDogbone = _ui.commandDefinitions.addButtonDefinition(
+            self.REFRESH_COMMAND_ID, 
+            'DogboneRefresh', 
+            'Rebuilds dogbones whose source edges or parameters have changed', 
+            'Resources')
+
+        self.onRefreshCreate(event=refreshButtonDogbone.commandCreated)
+        # Create controls for Manufacturing Workspace
+        mfgEnv = _ui.workspaces.itemById('MfgWorkingModelEnv')
+        mfgTab = mfgEnv.toolbarTabs.itemById('MfgSolidTab')
+        mfgSolidPanel = mfgTab.toolbarPanels.itemById('SolidCreatePanel')
+        buttonControlMfg = mfgSolidPanel.controls.addCommand(refreshButtonDogbone, 'refreshDogboneBtn')
+
+        # Create controls for the Design Workspace
+        createPanel = _ui.allToolbarPanels.itemById('SolidCreatePanel')
+        buttonControl = createPanel.controls.addCommand(refreshButtonDogbone, 'refreshDogboneBtn')
+
+    def removeRefreshButton(self):
+        createPanel = _ui.allToolbarPanels.itemById('SolidCreatePanel')
+        if cntrl := createPanel.controls.itemById(self.REFRESH_COMMAND_ID):
+            cntrl.deleteMe()
+
+        mfgEnv = _ui.workspaces.itemById('MfgWorkingModelEnv')
+        mfgTab = mfgEnv.toolbarTabs.itemById('MfgSolidTab')
+        mfgSolidPanel = mfgTab.toolbarPanels.itemById('SolidCreatePanel')
+        if cntrl := mfgSolidPanel.controls.itemById(self.REFRESH_COMMAND_ID):
+            cntrl.deleteMe()
+
+        if cmdDef := _ui.commandDefinitions.itemById(self.REFRESH_COMMAND_ID):
+            cmdDef.deleteMe()
 
     def addButton(self):
         try:
@@ -192,18 +334,205 @@ class DogboneCommand(object):
         if cmdDef := _ui.commandDefinitions.itemById(self.COMMAND_ID):
             cmdDef.deleteMe()
 
-    # @eventHandler(handler_cls = adsk.core.CommandCreatedEventHandler)
-    # def onRefreshCreate(self, args:adsk.core.CommandCreatedEventArgs):
-    #         inputs = args.command.commandInputs
-    #         edgeSelectCommand = inputs.itemById('edgeSelect')
-    #         if not edgeSelectCommand.isVisible:
-    #             return
-    #         focusState = inputs.itemById('faceSelect').hasFocus
-    #         edgeSelectCommand.hasFocus = True
-    #         [_ui.activeSelections.removeByEntity(edgeObj.edge) for edgeObj in self.selectedEdges.values()]
-    #         [faceObj.reSelectEdges() for faceObj in self.selectedFaces.values()]
-    #         inputs.itemById('faceSelect').hasFocus = focusState
-    #         return
+    @eventHandler(handler_cls = adsk.core.CommandCreatedEventHandler)
+    def onRefreshCreate(self, args:adsk.core.CommandCreatedEventArgs):
+        # no inputs - the command executes straight away
+        self.onRefreshExecute(event=args.command.execute)
+
+    @eventHandler(handler_cls = adsk.core.CommandEventHandler)
+    def onRefreshExecute(self, args:adsk.core.CommandEventArgs):
+        '''
+        finds the dogbone records of the design through their attributes and rebuilds only the stale ones -
+        those whose source edges moved, or whose current parameters (see recordParams) differ from the recorded ones
+        records whose source faces or edges can no longer be found are left as they are
+        '''
+        start = time.time()
+        self.readDefaults()
+        self.resetSessionCaches()
+        timeline = _design.timeline
+
+        stale, unresolved = [], []
+        records = self.dogboneRecords()
+        # source edges are looked up as they were just before the dogbones cut them -
+        # in timeline order, so the marker only ever moves forward and the tail is recomputed once
+        try:
+            for record, entities in sorted(records.values(), key=lambda item: min(entity.timelineObject.index for entity in item[1])):
+                timeline.markerPosition = min(entity.timelineObject.index for entity in entities)
+                signature = self.sourceSignature(record)
+                if signature is None:
+                    unresolved.append(record)
+                    continue
+                params = self.recordParams(record)
+                if record.isStale(signature, params):
+                    stale.append((record, entities, params))
+        finally:
+            timeline.moveToEnd()
+
+        if stale:
+            # suppressed, not deleted, until the sources of each record are found in the design as it is without them
+            self.suppressEntities([entity for _, entities, _ in stale for entity in entities], True)
+            rebuild = []
+            for record, entities, params in stale:
+                if self.resolveRecord(record):
+                    rebuild.append((record, entities, params))
+                else:
+                    unresolved.append(record)
+                    self.suppressEntities(entities, False)
+            stale = rebuild
+
+        self.logger.info(f'refresh: {len(stale)} of {len(records)} dogbone records stale, {len(unresolved)} unresolved')
+
+        if stale:
+            # latest first, so the timeline indices of the rest stay valid
+            for entity in sorted((entity for _, entities, _ in stale for entity in entities), 
+                                 key=lambda entity: entity.timelineObject.index, reverse=True):
+                entity.deleteMe()
+
+            # records with the same parameters are rebuilt together
+            byParams = defaultdict(list)
+            for record, _, params in stale:
+                byParams[json.dumps(params, sort_keys=True)].append(record)
+
+            defaults = self.param
+            batch = dbUtils.DeferredCompute(_design)
+            try:
+                for params, paramRecords in byParams.items():
+                    self.param = dataclasses.replace(defaults, **json.loads(params))
+                    self.selectedEdges = {}
+                    self.selectedFaces = {}
+                    self.selectedOccurrences = {}
+                    self.resetSessionCaches()
+                    for record in paramRecords:
+                        if not self.selectRecord(record):
+                            self.logger.error(f'refresh: sources of dogbone record {record.recordId} lost after its features were deleted')
+                    # the user parameters already in the design drive every parametric dogbone - they are only written if missing
+                    self.createDogbones(batch, syncParameters = not _design.userParameters.itemByName('dbRadius'))
+            finally:
+                self.param = defaults
+            self.logger.info(f'refresh phase timings - {batch.summary()}')
+        self.resetSessionCaches()
+        unresolvedNote = f'\n{len(unresolved)} left as they are - their faces or edges can no longer be found' if unresolved else ''
+        dbUtils.messageBox(f'{len(stale)} of {len(records)} dogbone groups rebuilt in {time.time() - start:.02f} sec{unresolvedNote}')
+
+    def recordParams(self, record:DogboneRecord)->dict:
+        '''
+        the parameters record would be built with now - the dialog defaults, keeping the record's
+        parametric or static mode; the tool size of parametric records comes from the design's user parameters
+        '''
+        params = dict(record.params)
+        params.update({name: value for name, value in paramsKey(self.param).items() if name != 'parametric'})
+        if params.get('parametric'):
+            userParams = _design.userParameters
+            for name, userParamName in (('toolDiaStr', 'dbToolDia'), ('toolDiaOffsetStr', 'dbOffset')):
+                if userParam := userParams.itemByName(userParamName):
+                    params[name] = userParam.expression
+            if userParam := userParams.itemByName('dbMinPercent'):
+                params['minimalPercent'] = userParam.value
+        return params
+
+    def suppressEntities(self, entities, isSuppressed):
+        '''
+        (un)suppresses the timeline objects of entities with one recompute - the marker is rolled back in front of them
+        '''
+        if not entities:
+            return
+        timeline = _design.timeline
+        timeline.markerPosition = min(entity.timelineObject.index for entity in entities)
+        try:
+            for entity in entities:
+                entity.timelineObject.isSuppressed = isSuppressed
+        finally:
+            timeline.moveToEnd()
+
+    def dogboneRecords(self):
+        '''
+        returns {record id: (DogboneRecord, [tagged features and sketches, ...])}
+        '''
+        records = {}
+        for attribute in _design.findAttributes(DOGBONEGROUP, RECORD):
+            entity = attribute.parent
+            if not entity:
+                continue
+            record = DogboneRecord.fromJson(attribute.value)
+            records.setdefault(record.recordId, (record, []))[1].append(entity)
+        return records
+
+    def resolveRecord(self, record:DogboneRecord):
+        '''
+        returns ([source faces], [source edges]) of record as they are now - None if any of them can't be found
+        '''
+        def resolve(token):
+            entities = _design.findEntityByToken(token)
+            return entities[0] if entities and entities[0].isValid else None
+
+        faces = [resolve(token) for token in record.faceTokens]
+        edges = [resolve(token) for token in record.edgeTokens]
+        if not all(faces) or not all(edges):
+            return None
+        return faces, edges
+
+    def sourceSignature(self, record:DogboneRecord):
+        '''
+        geometry signature of the record's source edges as they are now - None if any source face or edge is gone
+        '''
+        resolved = self.resolveRecord(record)
+        if not resolved:
+            return None
+        return geometrySignature([(edge.startVertex.geometry.asArray(), edge.endVertex.geometry.asArray()) for edge in resolved[1]])
+
+    def selectRecord(self, record:DogboneRecord)->bool:
+        '''
+        selects the source faces of record again, with exactly the recorded edges - the angle window
+        is not applied again, the edges were picked (or deselected) when the record was made
+        returns False if the sources can't be found
+        '''
+        resolved = self.resolveRecord(record)
+        if not resolved:
+            return False
+        faces, edges = resolved
+        # a window every corner angle falls in - only the corners passed to DbFace are used
+        windowParams = dataclasses.replace(self.param, parametric = False, acuteAngle = True, obtuseAngle = True, 
+                                           minAngleLimit = 0.0, maxAngleLimit = 360.0)
+        for face in faces:
+            faceId = calcId(face)
+            if faceId in self.selectedFaces:
+                continue
+            snapshot = self.topologySnapshot(face)
+            edgeIndices = set()
+            for edge in edges:
+                try:
+                    edgeIndices.add(snapshot.edgeIndex(edge))
+                except KeyError:
+                    pass  # an edge of another face of the record
+            corners = [corner for corner in snapshot.faceCorners(snapshot.faceIndex(makeNative(face))) if corner.edge in edgeIndices]
+            dbFace = DbFace(parent = self, face = face, params = windowParams, commandInputsEdgeSelect = None, corners = corners)
+            self.selectedFaces[faceId] = dbFace
+            occurrenceToken = face.assemblyContext.entityToken if face.assemblyContext else face.body.entityToken
+            self.selectedOccurrences.setdefault(occurrenceToken, []).append(dbFace)
+        return True
+
+    def dogboneRecord(self, plan)->DogboneRecord:
+        '''
+        what the dogbones of plan are built from - taken before any of them is cut
+        '''
+        edges = [edge.native for edge in plan.edges]
+        return DogboneRecord(faceTokens = [face.native.entityToken for face, _ in plan.faces],
+                             edgeTokens = [edge.entityToken for edge in edges],
+                             signature = geometrySignature([(edge.startVertex.geometry.asArray(), edge.endVertex.geometry.asArray()) for edge in edges]),
+                             params = paramsKey(self.param))
+
+    def tagDogbones(self, record:DogboneRecord, startTlMarker, endTlMarker):
+        '''
+        tags every feature and sketch in the timeline range with record - the registry the refresh command works from
+        '''
+        recordJson = record.toJson()
+        for index in range(startTlMarker, endTlMarker + 1):
+            entity = _design.timeline.item(index).entity
+            if not entity or not hasattr(entity, 'attributes'):
+                continue
+            entity.attributes.add(DOGBONEGROUP, ID, record.recordId)
+            entity.attributes.add(DOGBONEGROUP, REV_ID, record.revision)
+            entity.attributes.add(DOGBONEGROUP, RECORD, recordJson)
 
     @eventHandler(handler_cls = adsk.core.CommandCreatedEventHandler)
     def onCreate(self, args:adsk.core.CommandCreatedEventArgs):
@@ -236,16 +565,29 @@ class DogboneCommand(object):
         self.selectedEdges = {}
         self.selectedFaces = {}
         self.selectedOccurrences = {}
+        self.selectableFaces = {}
+        self.resetSessionCaches()
 
         inputs:adsk.core.CommandInputs = args.command.commandInputs
+        self.commandInputs = inputs
         
         selInput0 = inputs.addSelectionInput(
             'faceSelect', 'Face',
             'Select a face to apply dogbones to all internal corner edges')
-        selInput0.tooltip ='Select a face to apply dogbones to all internal corner edges\n*** Select faces by clicking on them. DO NOT DRAG SELECT! ***' 
+        selInput0.tooltip ='Select a face to apply dogbones to all internal corner edges\n*** Select faces by clicking on them. DO NOT DRAG SELECT! ***\nUse Auto Detect to pick up every face of a body at once' 
         selInput0.addSelectionFilter('PlanarFaces')
         selInput0.setSelectionLimits(1,0)
         
+        bodySelectInput = inputs.addSelectionInput(
+            'bodySelect', 'Auto Detect',
+            'Select a body or component to find all of its internal corner edges')
+        bodySelectInput.tooltip = 'Select a body or component to find all of its internal corner edges'
+        bodySelectInput.tooltipDescription = 'Every face with inside corners dropping down from it is added to the face selection.\n' \
+                                             'If faces of the body are already selected, only faces parallel to them are added.'
+        bodySelectInput.addSelectionFilter('SolidBodies')
+        bodySelectInput.addSelectionFilter('Occurrences')
+        bodySelectInput.setSelectionLimits(0,0)
+
         selInput1 = inputs.addSelectionInput(
             'edgeSelect', 'DogBone Edges',
             'Select or de-select any internal edges dropping down from a selected face (to apply dogbones to')
@@ -360,7 +702,18 @@ class DogboneCommand(object):
                                                               "", 
                                                               self.param.benchmark)
         benchMark.tooltip = "Enables benchmarking"
-        benchMark.tooltipDescription = "When enabled, shows overall time taken to process all selected dogbones."
+        benchMark.tooltipDescription = "When enabled, shows overall time taken to process all selected dogbones.\n" \
+                                       "In parametric mode also the time to recompute after a change of dbToolDia."
+
+        holesPerFaceInput = settingGroupChildInputs.addBoolValueInput("holesPerFace", 
+                                                                      "Hole per face", 
+                                                                      True, 
+                                                                      "", 
+                                                                      self.param.holesPerFace)
+        holesPerFaceInput.tooltip = "Parametric mode: one hole feature per face"
+        holesPerFaceInput.tooltipDescription = "When enabled, all the dogbones of a face are placed by one hole feature, on sketch points " \
+                                               "dimensioned to dbHoleOffset, instead of one hole feature per corner.\n" \
+                                               "Fewer timeline features make parameter changes recompute faster."
 
         logDropDownInp:adsk.core.DropDownCommandInput = settingGroupChildInputs.addDropDownCommandInput("logging", "Logging level", adsk.core.DropDownStyles.TextListDropDownStyle)
         logDropDownInp.tooltip = "Enables logging"
@@ -378,6 +731,48 @@ class DogboneCommand(object):
         self.onFaceSelect(event=cmd.selectionEvent)
         self.onValidate(event=cmd.validateInputs)
         self.onChange(event=cmd.inputChanged)
+        self.onDestroy(event=cmd.destroy)
+
+        self.refilterEvent = _app.registerCustomEvent(REFILTER_EVENT_ID)
+        self.onRefilter(event=self.refilterEvent)
+
+    @eventHandler(handler_cls=adsk.core.CommandEventHandler)
+    def onDestroy(self, args:adsk.core.CommandEventArgs):
+        self.cancelRefilter()
+        _app.unregisterCustomEvent(REFILTER_EVENT_ID)
+        self.resetSessionCaches()
+
+    @eventHandler(handler_cls=adsk.core.CustomEventHandler)
+    def onRefilter(self, args:adsk.core.CustomEventArgs):
+        self.refilterTimer = None
+        self.refilterEdges()
+
+    def scheduleRefilter(self):
+        '''
+        debounces angle limit changes - the refilter custom event only fires once the input 
+        has been quiet for REFILTER_DELAY seconds
+        '''
+        self.cancelRefilter()
+        self.refilterTimer = threading.Timer(REFILTER_DELAY, _app.fireCustomEvent, args=(REFILTER_EVENT_ID,))
+        self.refilterTimer.daemon = True
+        self.refilterTimer.start()
+
+    def cancelRefilter(self):
+        if self.refilterTimer:
+            self.refilterTimer.cancel()
+            self.refilterTimer = None
+
+    def refilterEdges(self):
+        '''
+        re-applies the angle limits to the corner angles cached on each selected face
+        '''
+        edgeSelectCommand = self.commandInputs.itemById('edgeSelect')
+        if not edgeSelectCommand.isVisible:
+            return
+        focusState = self.commandInputs.itemById('faceSelect').hasFocus
+        edgeSelectCommand.hasFocus = True
+        [faceObj.applyAngleLimits() for faceObj in self.selectedFaces.values()]
+        self.commandInputs.itemById('faceSelect').hasFocus = focusState
 
     @eventHandler(handler_cls=adsk.core.CommandEventHandler)
     def onExecutePreview(self, args:adsk.core.CommandEventArgs):
@@ -428,25 +823,30 @@ class DogboneCommand(object):
         if changedInput.id == 'maxSlider':
             self.param.maxAngleLimit = changedInput.commandInputs.itemById('maxSlider').valueOne
 
-        # 
+        if changedInput.id == 'minSlider' \
+            or changedInput.id == 'maxSlider':  # slider drags fire continuously - only refilter once they settle
+            self.scheduleRefilter()
+            return
+
         if changedInput.id == 'acuteAngle' \
             or changedInput.id == 'obtuseAngle' \
-            or changedInput.id == 'minSlider' \
-            or changedInput.id == 'maxSlider'\
             or changedInput.id == 'modeRow':  # refresh edges after specific input changes
-            edgeSelectCommand = changedInput.parentCommand.commandInputs.itemById('edgeSelect')
-            if not edgeSelectCommand.isVisible:
-                return
-            focusState = changedInput.parentCommand.commandInputs.itemById('faceSelect').hasFocus
-            edgeSelectCommand.hasFocus = True
-            [_ui.activeSelections.removeByEntity(edgeObj.edge) for edgeObj in self.selectedEdges.values()]
-            [faceObj.reSelectEdges() for faceObj in self.selectedFaces.values()]
-            changedInput.parentCommand.commandInputs.itemById('faceSelect').hasFocus = focusState
+            self.refilterEdges()
             return
             
+        if changedInput.id == 'bodySelect':
+            if changedInput.selectionCount:
+                entities = [changedInput.selection(i).entity for i in range(changedInput.selectionCount)]
+                changedInput.clearSelection()
+                [self.addBodyCorners(entity) for entity in entities]
+            return
+
         if changedInput.id != 'faceSelect' and changedInput.id != 'edgeSelect':
             return
 
+        if changedInput.id == 'faceSelect' and self.addingFaces:
+            return
+
         self.logger.debug(f'input changed- {changedInput.id}')
         if changedInput.id == 'faceSelect':
 
@@ -461,6 +861,7 @@ class DogboneCommand(object):
                     self.selectedEdges = {}
                     self.selectedFaces = {}
                     self.selectedOccurrences = {}
+                    self.selectableFaces = {}
                     changedInput.commandInputs.itemById('edgeSelect').clearSelection()
                     changedInput.commandInputs.itemById('faceSelect').hasFocus = True                    
                     changedInput.commandInputs.itemById('edgeSelect').isVisible = False   
@@ -471,9 +872,11 @@ class DogboneCommand(object):
                 missingFaces = set(self.selectedFaces.keys()) ^ selectionSet
                 changedInput.commandInputs.itemById('edgeSelect').isVisible = True   
                 changedInput.commandInputs.itemById('edgeSelect').hasFocus = True
+                changedOccurrenceIds = {self.selectedFaces[missingFace].occurrenceId for missingFace in missingFaces}
                 [(self.selectedFaces[missingFace].removeFaceFromSelectedOccurrences(),
                   self.selectedFaces[missingFace].deleteEdges(),
                    self.selectedFaces.pop(missingFace)) for missingFace in missingFaces]
+                [self.updateSelectableFaces(occurrenceId) for occurrenceId in changedOccurrenceIds]
                 changedInput.commandInputs.itemById('faceSelect').hasFocus = True
                 return
              
@@ -505,6 +908,7 @@ class DogboneCommand(object):
                 self.selectedOccurrences[activeOccurrenceId] = faces # adds a face to a list of faces associated with this occurrence
                 self.selectedFaces.update( {faceObj.faceId: faceObj for faceObj in t})
                 [self.selectedFaces[faceId].selectAll() for faceId in addedFaces] 
+                self.updateSelectableFaces(activeOccurrenceId)
                 changedInput.commandInputs.itemById('faceSelect').hasFocus = True
             return
             #end of processing faces
@@ -548,6 +952,7 @@ class DogboneCommand(object):
         self.param.toolDiaStr = inputs['toolDia'].expression
         self.param.toolDiaOffsetStr = inputs['toolDiaOffset'].expression
         self.param.benchmark = inputs['benchmark'].value
+        self.param.holesPerFace = inputs['holesPerFace'].value
         self.param.dbType = inputs['dogboneType'].selectedItem.name
         self.param.minimalPercent = inputs['minimalPercent'].value
         self.param.fromTop = (inputs['depthExtent'].selectedItem.name == 'From Top Face')
@@ -569,6 +974,7 @@ class DogboneCommand(object):
         self.logger.debug(f'self.param.toolDiaOffsetStr = {self.param.toolDiaOffsetStr}')
         self.logger.debug(f'self.param.toolDiaOffset = {self.param.toolDiaOffset}')
         self.logger.debug(f'self.param.benchmark = {self.param.benchmark}')
+        self.logger.debug(f'self.param.holesPerFace = {self.param.holesPerFace}')
         self.logger.debug(f'self.param.mortiseType = {self.param.longSide}')
         self.logger.debug(f'self.param.expandModeGroup = {self.param.expandModeGroup}')
         self.logger.debug(f'self.param.expandSettingsGroup = {self.param.expandSettingsGroup}')
@@ -601,81 +1007,71 @@ class DogboneCommand(object):
     @eventHandler(handler_cls = adsk.core.CommandEventHandler)
     def onExecute(self, args):
         start = time.time()
+        batch = dbUtils.DeferredCompute(_design)
 
         self.logger.log(0, 'logging Level = %(levelname)')
         self.parseInputs(args.firingEvent.sender.commandInputs)
         self.logHandler.setLevel(self.param.logging)
         self.logger.setLevel(self.param.logging)
 
+        # a slider change still waiting on the debounce timer would otherwise never reach the selection
+        if self.refilterTimer:
+            self.cancelRefilter()
+            self.refilterEdges()
+
         self.writeDefaults()
 
+        self.createDogbones(batch)
+        if self.param.parametric and self.param.benchmark:
+            self.recomputeTime = self.benchmarkRecompute()
+
+        self.logger.info(f'phase timings - {batch.summary()}')
+        self.resetSessionCaches()
+        self.logger.info('all dogbones complete\n-------------------------------------------\n')
+
+        self.closeLogger()
+        
+        if self.param.benchmark:
+            recompute = f"\nRecompute after dbToolDia change: {self.recomputeTime:.02f} sec" if self.param.parametric else ''
+            dbUtils.messageBox(f"Benchmark: {time.time() - start:.02f} sec processing {len(self.edges)} edges{recompute}\n{batch.summary()}")
+
+
+    def createDogbones(self, batch:dbUtils.DeferredCompute, syncParameters = True):
+        '''
+        creates the dogbones of the current selection with the current params - from onExecute and the refresh command
+        syncParameters - write the params to the dbToolDia etc. user parameters (parametric only)
+        '''
         if self.param.parametric:
             userParams:adsk.fusion.UserParameters = _design.userParameters
+            lengthUnits = _design.unitsManager.defaultLengthUnits
+            holeOffset = 'dbRadius / sqrt(2)' + (' * (1 + dbMinPercent/100)') if self.param.dbType == 'Minimal Dogbone' else 'dbRadius' if self.param.dbType == 'Mortise Dogbone' else 'dbRadius / sqrt(2)'
             
             #set up parameters, so that changes can be easily made after dogbones have been inserted
-            if not userParams.itemByName('dbToolDia'):
-                dValIn = adsk.core.ValueInput.createByString(self.param.toolDiaStr)
-                dParameter = userParams.add('dbToolDia', dValIn, _design.unitsManager.defaultLengthUnits, '')
-                dParameter.isFavorite = True
-            else:
-                uParam = userParams.itemByName('dbToolDia')
-                uParam.expression = self.param.toolDiaStr
-                uParam.isFavorite = True
-                
-            if not userParams.itemByName('dbOffset'):
-                rValIn = adsk.core.ValueInput.createByString(self.param.toolDiaOffsetStr)
-                rParameter = userParams.add('dbOffset',rValIn, _design.unitsManager.defaultLengthUnits, 'Do NOT change formula')
-            else:
-                uParam = userParams.itemByName('dbOffset')
-                uParam.expression = self.param.toolDiaOffsetStr
-                uParam.comment = 'Do NOT change formula'
-
-            if not userParams.itemByName('dbRadius'):
-                rValIn = adsk.core.ValueInput.createByString('(dbToolDia + dbOffset)/2')
-                rParameter = userParams.add('dbRadius',rValIn, _design.unitsManager.defaultLengthUnits, 'Do NOT change formula')
-            else:
-                uParam = userParams.itemByName('dbRadius')
-                uParam.expression = '(dbToolDia + dbOffset)/2'
-                uParam.comment = 'Do NOT change formula'
-
-            if not userParams.itemByName('dbMinPercent'):
-                rValIn = adsk.core.ValueInput.createByReal(self.param.minimalPercent)
-                rParameter = userParams.add('dbMinPercent',rValIn, '', '')
-                rParameter.isFavorite = True
-            else:
-                uParam = userParams.itemByName('dbMinPercent')
-                uParam.value = self.param.minimalPercent
-                uParam.comment = ''
-                uParam.isFavorite = True
-
-            if not userParams.itemByName('dbHoleOffset'):
-                oValIn = adsk.core.ValueInput.createByString('dbRadius / sqrt(2)' + (' * (1 + dbMinPercent/100)') if self.param.dbType == 'Minimal Dogbone' else 'dbRadius' if self.param.dbType == 'Mortise Dogbone' else 'dbRadius / sqrt(2)')
-                oParameter = userParams.add('dbHoleOffset', oValIn, _design.unitsManager.defaultLengthUnits, 'Do NOT change formula')
-            else:
-                uParam = userParams.itemByName('dbHoleOffset')
-                uParam.expression = 'dbRadius / sqrt(2)' + (' * (1 + dbMinPercent/100)') if self.param.dbType == 'Minimal Dogbone' else 'dbRadius' if self.param.dbType == 'Mortise Dogbone' else 'dbRadius / sqrt(2)'
-                uParam.comment = 'Do NOT change formula'
+            #only real differences are written - each write recomputes every dogbone already in the design
+            if syncParameters:
+                with batch.phase('parameters'):
+                    dbUtils.syncUserParameters(_design, [
+                        dbUtils.UserParameterSpec('dbToolDia', expression = self.param.toolDiaStr, units = lengthUnits, isFavorite = True),
+                        dbUtils.UserParameterSpec('dbOffset', expression = self.param.toolDiaOffsetStr, units = lengthUnits, comment = 'Do NOT change formula'),
+                        dbUtils.UserParameterSpec('dbRadius', expression = '(dbToolDia + dbOffset)/2', units = lengthUnits, comment = 'Do NOT change formula'),
+                        dbUtils.UserParameterSpec('dbMinPercent', value = self.param.minimalPercent, comment = '', isFavorite = True),
+                        dbUtils.UserParameterSpec('dbHoleOffset', expression = holeOffset, units = lengthUnits, comment = 'Do NOT change formula'),
+                        ])
 
             self.radius = userParams.itemByName('dbRadius').value
             self.offset = adsk.core.ValueInput.createByString('dbOffset')
             self.offset = adsk.core.ValueInput.createByReal(userParams.itemByName('dbHoleOffset').value)
 
-            self.createParametricDogbones()
+            with batch, batch.phase('features'):
+                self.createParametricDogbones(batch)
 
         else: #Static dogbones
 
             self.radius = (self.param.toolDia + self.param.toolDiaOffset) / 2
             self.offset = self.radius / sqrt(2)  * (1 + self.param.minimalPercent/100) if self.param.dbType == 'Minimal Dogbone' else self.radius if self.param.dbType == 'Mortise Dogbone' else self.radius / sqrt(2)
             
-            self.createStaticDogbones()
-        
-        self.logger.info('all dogbones complete\n-------------------------------------------\n')
-
-        self.closeLogger()
-        
-        if self.param.benchmark:
-            dbUtils.messageBox(f"Benchmark: {time.time() - start:.02f} sec processing {len(self.edges)} edges")
-
+            with batch, batch.phase('features'):
+                self.createStaticDogbones()
 
     ################################################################################        
     @eventHandler(handler_cls = adsk.core.ValidateInputsEventHandler)
@@ -713,69 +1109,20 @@ class DogboneCommand(object):
             if not len( self.selectedOccurrences ): #get out if the face selection list is empty
                 eventArgs.isSelectable = True
                 return
-            if not eventArgs.selection.entity.assemblyContext:
-                # dealing with a root component body
-
-                activeBodyName = hash(eventArgs.selection.entity.body.entityToken)
-                try:            
-                    faces = self.selectedOccurrences[activeBodyName]
-                    for face in faces:
-                        if face.isSelected:
-                            primaryFace = face
-                            break
-                    else:
-                        eventArgs.isSelectable = True
-                        return
-                except (KeyError, IndexError) as e:
-                    return
-
-                primaryFaceNormal = dbUtils.getFaceNormal(primaryFace.face)
-                if primaryFaceNormal.isParallelTo(dbUtils.getFaceNormal(eventArgs.selection.entity)):
-                    eventArgs.isSelectable = True
-                    return
-                eventArgs.isSelectable = False
-                return
-            # End of root component face processing
-            
-            #==============================================================================
-            # Start of occurrence face processing              
-            #==============================================================================
-            activeOccurrence = eventArgs.selection.entity.assemblyContext
-            activeOccurrenceId = hash(activeOccurrence.entityToken)
-            activeComponent = activeOccurrence.component
-            
-            # we got here because the face is either not in root or is on the existing selected list    
-            # at this point only need to check for duplicate component selection - Only one component allowed, to save on conflict checking
-            try:
-                selectedComponentList = [x[0].face.assemblyContext.component for x in self.selectedOccurrences.values() if x[0].face.assemblyContext]
-            except KeyError:
-               eventArgs.isSelectable = True
-               return
 
-            if activeComponent not in selectedComponentList:
-                    eventArgs.isSelectable = True
-                    return
+            # selectable faces and blocked components are precomputed by updateSelectableFaces
+            entity = eventArgs.selection.entity
+            activeOccurrence = entity.assemblyContext
+            activeOccurrenceId = hash(activeOccurrence.entityToken) if activeOccurrence else hash(entity.body.entityToken)
 
-            if activeOccurrenceId not in self.selectedOccurrences:  #check if mouse is over a face that is not already selected
-                eventArgs.isSelectable = False
+            selectable = self.selectableFaces.get(activeOccurrenceId)
+            if selectable is not None:
+                # only faces parallel to the primary face of the occurrence (or root body)
+                eventArgs.isSelectable = calcId(entity) in selectable
                 return
-                
-            try:            
-                faces = self.selectedOccurrences[activeOccurrenceId]
-                for face in faces:
-                    if face.isSelected:
-                        primaryFace = face
-                        break
-                    else:
-                        eventArgs.isSelectable = True
-                        return
-            except KeyError:
-                return
-            primaryFaceNormal = dbUtils.getFaceNormal(primaryFace.face)
-            if primaryFaceNormal.isParallelTo(dbUtils.getFaceNormal(eventArgs.selection.entity)):
-                eventArgs.isSelectable = True
-                return
-            eventArgs.isSelectable = False
+
+            # other occurrences of an already selected component are fine - dogbones are planned once per native body
+            eventArgs.isSelectable = True
             return
             # end selecting faces
             
@@ -805,7 +1152,73 @@ class DogboneCommand(object):
         return _rootComp.xZConstructionPlane if self.yUp else _rootComp.xYConstructionPlane
 
     # The main algorithm for parametric dogbones
-    def createParametricDogbones(self):
+    def addFaceHoles(self, comp:adsk.fusion.Component, holes:adsk.fusion.HoleFeatures, holePlane:adsk.fusion.BRepFace, body:adsk.fusion.BRepBody, corners):
+        '''
+        places the dogbones of one face with one hole feature per extent entity (usually just one)
+        corners - [(centrePoint, edge1, edge1Offset, edge2, edge2Offset, extentToEntity), ...] as for setPositionByPlaneAndOffsets
+        each hole centre is a sketch point on holePlane, dimensioned to the projected corner edges by dbHoleOffset -
+        or made coincident with the edge where the offset is zero (mortise side)
+        returns the hole features - the caller defers them until all holes are placed
+        '''
+        holeFeatures = []
+        extents = defaultdict(list)
+        for corner in corners:
+            extents[corner[5].entityToken].append(corner)
+
+        for extentCorners in extents.values():
+            sketch:adsk.fusion.Sketch = comp.sketches.add(holePlane)
+            sketch.name = 'dogbone'
+            sketch.isComputeDeferred = True
+            projectedLines = {}  # corner edges are shared by neighbouring corners - projected once
+
+            points = adsk.core.ObjectCollection.create()
+            for centrePoint, edge1, edge1Offset, edge2, edge2Offset, _ in extentCorners:
+                point = sketch.sketchPoints.add(sketch.modelToSketchSpace(centrePoint))
+                for cornerEdge, offset in ((edge1, edge1Offset), (edge2, edge2Offset)):
+                    edgeKey = cornerEdge.entityToken
+                    line = projectedLines.get(edgeKey)
+                    if line is None:
+                        line = projectedLines[edgeKey] = sketch.project(cornerEdge).item(0)
+                    if offset.valueType == adsk.core.ValueTypes.RealValueType:
+                        sketch.geometricConstraints.addCoincident(point, line)
+                        continue
+                    textPoint = point.geometry.copy()
+                    textPoint.translateBy(line.startSketchPoint.geometry.vectorTo(line.endSketchPoint.geometry))
+                    dimension = sketch.sketchDimensions.addOffsetDimension(line, point, textPoint)
+                    dimension.parameter.expression = 'dbHoleOffset'
+                points.add(point)
+            sketch.isComputeDeferred = False
+
+            holeInput = holes.createSimpleInput(adsk.core.ValueInput.createByString('dbRadius*2'))
+            holeInput.isDefaultDirection = True
+            holeInput.tipAngle = adsk.core.ValueInput.createByString('180 deg')
+            holeInput.participantBodies = [body]
+            holeInput.setPositionBySketchPoints(points)
+            holeInput.setOneSideToExtent(extentCorners[0][5], False)
+            holeFeature = holes.add(holeInput)
+            holeFeature.name = 'dogbone'
+            holeFeatures.append(holeFeature)
+            self.logger.info(f'hole feature added - {points.count} dogbones')
+        return holeFeatures
+
+    def benchmarkRecompute(self):
+        '''
+        seconds Fusion takes to recompute the design after a change of dbToolDia - the parameter is restored afterwards
+        '''
+        toolDia = _design.userParameters.itemByName('dbToolDia')
+        expression = toolDia.expression
+        startTime = time.time()
+        toolDia.expression = f'({expression}) * 1.01'
+        recomputeTime = time.time() - startTime
+        toolDia.expression = expression
+        self.logger.info(f'recompute after dbToolDia change: {recomputeTime:.3f} sec ({"hole per face" if self.param.holesPerFace else "hole per corner"})')
+        return recomputeTime
+
+    def createParametricDogbones(self, batch:dbUtils.DeferredCompute):
+        '''
+        hole features are handed to batch suppressed - cutting would invalidate the edges later holes are referenced to,
+        and the batch recomputes them all at once when it closes
+        '''
         self.logger.info('Creating parametric dogbones')
         self.errorCount = 0
         if not _design:
@@ -814,19 +1227,23 @@ class DogboneCommand(object):
         offsetByStr = adsk.core.ValueInput.createByString('dbHoleOffset')
         centreDistance = self.radius*(1+self.param.minimalPercent/100 if self.param.dbType=='Minimal Dogbone' else  1)
         
-        for occurrenceFaces in self.selectedOccurrences.values():
+        for plan in self.dogbonePlans().values():
             startTlMarker = _design.timeline.markerPosition
+            record = self.dogboneRecord(plan)
+            firstFace = plan.faces[0][0]
 
-            comp:adsk.fusion.Component = occurrenceFaces[0].component
-            occ:adsk.fusion.Occurrence = occurrenceFaces[0].occurrence
+            comp:adsk.fusion.Component = firstFace.component
+            occ:adsk.fusion.Occurrence = firstFace.occurrence
 
             if self.param.fromTop:
-                (topFace, topFaceRefPoint) = dbUtils.getTopFace(occurrenceFaces[0].native)
+                (topFace, topFaceRefPoint) = dbUtils.getTopFace(firstFace.native, self.topologySnapshot(firstFace.native).heightIndex)
                 self.logger.info(f'Processing holes from top face - {topFace.body.name}')
 
-            for selectedFace in occurrenceFaces:
-                if len(selectedFace.selectedEdges) <1:
+            holes =  comp.features.holeFeatures
+            for selectedFace, selectedEdges in plan.faces:
+                if len(selectedEdges) <1:
                     self.logger.debug('Face has no edges')
+                faceCorners = []
                     
                 face = selectedFace.native
                 
@@ -845,10 +1262,10 @@ class DogboneCommand(object):
                     topFace = makeNative(topFace)
                        
                     self.logger.debug(f'topFace isValid = {topFace.isValid}')
-                    transformVector = dbUtils.getTranslateVectorBetweenFaces(face, topFace)
+                    transformVector = dbUtils.getTranslateVectorBetweenFaces(face, topFace, self.topologySnapshot(topFace))
                     self.logger.debug(f'creating transformVector to topFace = ({transformVector.x},{transformVector.y},{transformVector.z}) length = {transformVector.length}')
                                 
-                for selectedEdge in selectedFace.selectedEdges:
+                for selectedEdge in selectedEdges:
                     
                     self.logger.debug(f'Processing edge - {selectedEdge.edge.tempId}')
 
@@ -864,14 +1281,16 @@ class DogboneCommand(object):
                         continue # edges that have been processed already will not be valid any more - at the moment this is easier than removing the 
     #                    affected edge from self.edges after having been processed
                     edge = selectedEdge.native
+                    snapshot = self.topologySnapshot(edge)
+                    index = snapshot.adjacency
                     try:
-                        if not dbUtils.isEdgeAssociatedWithFace(face, edge):
+                        if not dbUtils.isEdgeAssociatedWithFace(face, edge, index):
                             continue  # skip if edge is not associated with the face currently being processed
                     except:
                         pass
                     
-                    startVertex:adsk.fusion.BRepVertex = dbUtils.getVertexAtFace(face, edge)
-                    extentToEntity = dbUtils.findExtent(face, edge)
+                    startVertex:adsk.fusion.BRepVertex = dbUtils.getVertexAtFace(face, edge, index)
+                    extentToEntity = dbUtils.findExtent(face, edge, index)
 
                     extentToEntity = makeNative(extentToEntity)
                     self.logger.debug(f'extentToEntity - {extentToEntity.isValid}')
@@ -879,7 +1298,7 @@ class DogboneCommand(object):
                         self.logger.debug('To face invalid')
 
                     try:
-                        (edge1, edge2) = dbUtils.getCornerEdgesAtFace(face, edge)
+                        (edge1, edge2) = dbUtils.getCornerEdgesAtFace(face, edge, index)
                     except:
                         self.logger.exception('Failed at findAdjecentFaceEdges')
                         dbUtils.messageBox(f'Failed at findAdjecentFaceEdges:\n{traceback.format_exc()}')
@@ -894,11 +1313,19 @@ class DogboneCommand(object):
                     dirVect.scaleBy(centreDistance)  #ideally radius should be linked to parameters, 
  
                     if self.param.dbType == 'Mortise Dogbone':
-                        direction0 = dbUtils.correctedEdgeVector(edge1,startVertex) 
-                        direction1 = dbUtils.correctedEdgeVector(edge2,startVertex)
+                        try:
+                            # lengths and directions from the face corner map - no further edge traversal
+                            corner = dbUtils.getFaceCorner(makeNative(face), makeNative(startVertex), snapshot)
+                            (edge1Length, direction0), (edge2Length, direction1) = (corner.side(snapshot.edgeIndex(makeNative(cornerEdge))) for cornerEdge in (edge1, edge2))
+                            direction0, direction1 = adsk.core.Vector3D.create(*direction0), adsk.core.Vector3D.create(*direction1)
+                        except KeyError:
+                            # full length edge vectors - only their direction is used
+                            direction0 = dbUtils.correctedEdgeVector(edge1,startVertex.geometry) 
+                            direction1 = dbUtils.correctedEdgeVector(edge2,startVertex.geometry)
+                            edge1Length, edge2Length = edge1.length, edge2.length
                         
-                        if self.longSide:
-                            if (edge1.length > edge2.length):
+                        if self.param.longSide:
+                            if (edge1Length > edge2Length):
                                 dirVect = direction0
                                 edge1OffsetByStr = adsk.core.ValueInput.createByReal(0)
                                 edge2OffsetByStr = offsetByStr
@@ -907,7 +1334,7 @@ class DogboneCommand(object):
                                 edge2OffsetByStr = adsk.core.ValueInput.createByReal(0)
                                 edge1OffsetByStr = offsetByStr
                         else:
-                            if (edge1.length > edge2.length):
+                            if (edge1Length > edge2Length):
                                 dirVect = direction1
                                 edge2OffsetByStr = adsk.core.ValueInput.createByReal(0)
                                 edge1OffsetByStr = offsetByStr
@@ -915,6 +1342,10 @@ class DogboneCommand(object):
                                 dirVect = direction0
                                 edge1OffsetByStr = adsk.core.ValueInput.createByReal(0)
                                 edge2OffsetByStr = offsetByStr
+                        # the centre sits centreDistance along the chosen side, whichever way the direction was found
+                        dirVect = dirVect.copy()
+                        dirVect.normalize()
+                        dirVect.scaleBy(centreDistance)
                     else:
                         dirVect:adsk.core.Vector3D = dbUtils.getFaceNormal(makeNative(selectedEdgeFaces[0])).copy()
                         dirVect.add(dbUtils.getFaceNormal(makeNative(selectedEdgeFaces[1])))
@@ -932,8 +1363,11 @@ class DogboneCommand(object):
                             holePlane = reValidateFace(comp, topFaceRefPoint)
                     else:
                         holePlane = makeNative(face)
+
+                    if self.param.holesPerFace:
+                        faceCorners.append((centrePoint, edge1, edge1OffsetByStr, edge2, edge2OffsetByStr, extentToEntity))
+                        continue
                          
-                    holes =  comp.features.holeFeatures
                     holeInput = holes.createSimpleInput(adsk.core.ValueInput.createByString('dbRadius*2'))
 #                    holeInput.creationOccurrence = occ #This needs to be uncommented once AD fixes component copy issue!!
                     holeInput.isDefaultDirection = True
@@ -949,14 +1383,14 @@ class DogboneCommand(object):
  
                     holeFeature = holes.add(holeInput)
                     holeFeature.name = 'dogbone'
-                    holeFeature.isSuppressed = True
-                    
-                for hole in holes:
-                    if hole.name[:7] != 'dogbone':
-                        break
-                    hole.isSuppressed = False
+                    batch.defer(holeFeature)
+
+                if faceCorners:
+                    for holeFeature in self.addFaceHoles(comp, holes, holePlane, makeNative(face.body), faceCorners):
+                        batch.defer(holeFeature)
                     
             endTlMarker = _design.timeline.markerPosition-1
+            self.tagDogbones(record, startTlMarker, endTlMarker)
             if endTlMarker - startTlMarker >0:
                 timelineGroup = _design.timeline.timelineGroups.add(startTlMarker,endTlMarker)
                 timelineGroup.name = 'dogbone'
@@ -966,65 +1400,202 @@ class DogboneCommand(object):
         if self.errorCount >0:
             dbUtils.messageBox(f'Reported errors:{self.errorCount}\nYou may not need to do anything, \nbut check holes have been created')
 
+    def mergeAxes(self, activeBody:adsk.fusion.BRepBody, edges, axes):
+        '''
+        drops coincident and contained dogbone cylinders and joins collinear ones whose depth ranges
+        overlap or touch (stacked corners of stepped pockets) - before any boolean work
+        axes - {edge: (startPoint, endPoint)}, the axis of an edge that takes over a joined span is extended in place
+        returns the set of edges whose dogbone is now cut by another one
+        acute corners carry a clearance box, so only plain cylinders take part
+        '''
+        plain = [edge for edge in edges if edge.cornerAngle >= math.pi/2]
+        radius = (self.param.toolDia + self.param.toolDiaOffset)/2
+        points = {edge: (tuple(axes[edge][0].asArray()), tuple(axes[edge][1].asArray())) for edge in plain}
+        before = dict(points)
+        absorbed, contained, joined = mergeEdgeAxes(points, radius)
+        if contained:
+            self.logger.info(f'{activeBody.name}: {contained} coincident or contained dogbones merged - {contained} booleans saved')
+        if joined:
+            for edge in plain:
+                if edge not in absorbed and points[edge] is not before[edge]:
+                    axes[edge] = (adsk.core.Point3D.create(*points[edge][0]), adsk.core.Point3D.create(*points[edge][1]))
+            self.logger.info(f'{activeBody.name}: {joined} stacked collinear dogbones joined - {joined} booleans saved')
+        return absorbed
+
+    def cutToolBodies(self, comp:adsk.fusion.Component, activeBody:adsk.fusion.BRepBody, edges, axes, topFace = None, union = True, bodies = ()):
+        '''
+        cuts the dogbones of edges from activeBody with one base feature and one combine
+        axes - {edge: (startPoint, endPoint)} from DbEdge.toolAxis
+        union - merge the tool bodies into one before the cut, otherwise the combine gets them all
+        bodies - ready made tool bodies (face outline prisms) cut along with those of edges
+        '''
+        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
+        toolCollection = adsk.core.ObjectCollection.create()
+
+        # tool bodies are merged pairwise in Morton order - keeps the intermediate bodies small and local
+        centres = [edge.dogboneCentre.asArray() for edge in edges]
+        for body in bodies:
+            box = body.boundingBox
+            centres.append(tuple((low + high)/2 for low, high in zip(box.minPoint.asArray(), box.maxPoint.asArray())))
+        toolBodies = spatialOrder([edge.getToolBody(params = self.param, topFace = topFace, axis = axes[edge]) for edge in edges] + list(bodies),
+                                  centres)
+        if union:
+            toolBodies = [balancedUnion(toolBodies, 
+                                        lambda target, tool: tempBrepMgr.booleanOperation(target, tool, adsk.fusion.BooleanTypes.UnionBooleanType))]
+
+        baseFeatures = comp.features.baseFeatures
+        baseFeature = baseFeatures.add()
+        baseFeature.name = 'dogbone'
+
+        baseFeature.startEdit()
+        for toolBody in toolBodies:
+            dbB = comp.bRepBodies.add(toolBody, baseFeature)
+            dbB.name = 'dogboneTool'
+        baseFeature.finishEdit()
+
+        for toolBody in baseFeature.bodies:
+            toolCollection.add(toolBody)
+
+        combineInput = comp.features.combineFeatures.createInput(targetBody = activeBody, 
+                                                                 toolBodies = toolCollection)
+        combineInput.isKeepToolBodies = False
+        combineInput.isNewComponent = False
+        combineInput.operation = adsk.fusion.FeatureOperations.CutFeatureOperation
+        combine = comp.features.combineFeatures.add(combineInput)
+        self.logger.debug(f'{activeBody.name}: {len(edges)} dogbones and {len(bodies)} outline prisms cut with one combine')
+
+    def faceProfileBodies(self, activeBody:adsk.fusion.BRepBody, edges, axes):
+        '''
+        tool bodies of the dogbones of one face, all of the same depth - one prism per outline loop
+        the outline of the union of their circles (and acute clearance rectangles) comes from DbProfile,
+        worked out in a frame on the common start plane of the tool axes, z along the axes
+        returns None if the outline has holes or a prism can't be built - the edges then get a tool body each
+        '''
+        radius = (self.param.toolDia + self.param.toolDiaOffset)/2
+        centreDistance = radius*((1+self.param.minimalPercent/100) if self.param.dbType == 'Minimal Dogbone' else  1)
+
+        origin, endPoint = axes[edges[0]]
+        depth = origin.distanceTo(endPoint)
+        zAxis = origin.vectorTo(endPoint)
+        zAxis.normalize()
+        # x along the first corner vector, squared up to the axis
+        xAxis = edges[0].cornerVector.copy()
+        along = zAxis.copy()
+        along.scaleBy(xAxis.dotProduct(zAxis))
+        xAxis.subtract(along)
+        xAxis.normalize()
+        yAxis = zAxis.crossProduct(xAxis)
+
+        def planePoint(point):
+            offset = origin.vectorTo(point)
+            return (offset.dotProduct(xAxis), offset.dotProduct(yAxis))
+
+        circles, rectangles = [], []
+        for edge in edges:
+            startPoint, _ = axes[edge]
+            circles.append((*planePoint(startPoint), radius))
+            if edge.cornerAngle >= math.pi/2:
+                continue
+            boxLength = radius/math.tan(edge.cornerAngle/2) - centreDistance
+            if boxLength/2 < 0.01:
+                continue
+            # acute corner clearance - from the dogbone centre along the corner vector, tool diameter wide
+            boxX = edge.cornerVector.copy()
+            boxX.normalize()
+            boxY = zAxis.crossProduct(boxX)
+            corners = []
+            for boxAlong, boxAcross in ((0, -radius), (boxLength, -radius), (boxLength, radius), (0, radius)):
+                corners.append(planePoint(adsk.core.Point3D.create(*(startPoint.asArray()[i] + boxAlong*boxX.asArray()[i] + boxAcross*boxY.asArray()[i] 
+                                                                     for i in range(3)))))
+            rectangles.append(corners)
+
+        loops = unionOutline(circles, rectangles)
+        if not loops or any(loopArea(loop) < 0 for loop in loops):
+            self.logger.debug(f'{activeBody.name}: dogbone outline has holes - one tool body per dogbone')
+            return None
+
+        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
+        matrix = adsk.core.Matrix3D.create()
+        matrix.setToAlignCoordinateSystems(adsk.core.Point3D.create(0, 0, 0), 
+                                           adsk.core.Vector3D.create(1, 0, 0), 
+                                           adsk.core.Vector3D.create(0, 1, 0), 
+                                           adsk.core.Vector3D.create(0, 0, 1),
+                                           origin, xAxis, yAxis, zAxis)
+        bodies = []
+        for loop in loops:
+            body = dbUtils.createPrism(loop, depth)
+            if not body:
+                self.logger.debug(f'{activeBody.name}: dogbone outline prism failed - one tool body per dogbone')
+                return None
+            tempBrepMgr.transform(body, matrix)
+            bodies.append(body)
+        self.logger.debug(f'{activeBody.name}: {len(edges)} dogbones outlined by {len(bodies)} prisms')
+        return bodies
+
     def createStaticDogbones(self):
         self.logger.info('Creating static dogbones')
         self.errorCount = 0
         if not _design:
             raise RuntimeError('No active Fusion design')
         
-        tempBrepMgr = adsk.fusion.TemporaryBRepManager.get()
-
-        for occurrenceFaces in self.selectedOccurrences.values():
+        for plan in self.dogbonePlans().values():
+            if not plan.edgeCount:
+                continue
             startTlMarker = _design.timeline.markerPosition
-            comp:adsk.fusion.Component = occurrenceFaces[0].component
-            occ:adsk.fusion.Occurrence = occurrenceFaces[0].occurrence 
+            record = self.dogboneRecord(plan)
+            firstFace = plan.faces[0][0]
             topFace = None  
             
             if self.param.fromTop:
-                topFace, topFaceRefPoint = dbUtils.getTopFace(occurrenceFaces[0].native)
+                topFace, topFaceRefPoint = dbUtils.getTopFace(firstFace.native, self.topologySnapshot(firstFace.native).heightIndex)
                 self.logger.debug(f'topFace ref point: {topFaceRefPoint.asArray()}')
                 self.logger.info(f'Processing holes from top face - {topFace.tempId}')
                 self.debugFace(topFace)
                 
-            for selectedFace in occurrenceFaces:
-
-                toolCollection = adsk.core.ObjectCollection.create()
-                toolBodies = None
- 
-                for edge in selectedFace.selectedEdges:
-                    if not toolBodies:
-                        toolBodies = edge.getToolBody(params = self.param, topFace = topFace)
+            # tool bodies are built in native space - features go into the component that owns the body,
+            # so they apply to every occurrence
+            comp:adsk.fusion.Component = firstFace.component
+            activeBody = firstFace.native.body
+            axes = {edge: edge.toolAxis(self.param, topFace) for edge in plan.edges}
+            absorbed = self.mergeAxes(activeBody, plan.edges, axes)
+
+            # the cutting strategy is picked from the timings of earlier runs on jobs of this size
+            faceCount = self.topologySnapshot(firstFace.native).faceCount
+            cornerCount = plan.edgeCount - len(absorbed)
+            strategy = self.strategyHistory.choose(faceCount, cornerCount)
+            startTime = time.time()
+
+            bodies = []
+            if strategy == PROFILE:
+                # faces whose dogbones all share one depth get their tool bodies as prisms of the face outline
+                edges = []
+                for _, faceEdges in plan.faces:
+                    faceEdges = [edge for edge in faceEdges if edge not in absorbed]
+                    prisms = None
+                    if faceEdges and len({round(axes[edge][0].distanceTo(axes[edge][1]), 6) for edge in faceEdges}) == 1:
+                        prisms = self.faceProfileBodies(activeBody, faceEdges, axes)
+                    if prisms:
+                        bodies.extend(prisms)
                     else:
-                        tempBrepMgr.booleanOperation(toolBodies, edge.getToolBody(params = self.param, topFace = topFace), adsk.fusion.BooleanTypes.UnionBooleanType)
-
-                baseFeatures = _rootComp.features.baseFeatures
-                baseFeature = baseFeatures.add()
-                baseFeature.name = 'dogbone'
-
-                baseFeature.startEdit()
-                dbB = _rootComp.bRepBodies.add(toolBodies, baseFeature)
-                dbB.name = 'dogboneTool'
-                baseFeature.finishEdit()
-
-                toolCollection.add(baseFeature.bodies.item(0))
-
-                activeBody = selectedFace.native.body
+                        edges.extend(faceEdges)
+            else:
+                edges = [edge for edge in plan.edges if edge not in absorbed]
+            if edges or bodies:
+                self.cutToolBodies(comp, activeBody, edges, axes, topFace, union = strategy != COMBINE, bodies = bodies)
 
-                combineInput = _rootComp.features.combineFeatures.createInput(targetBody = activeBody, 
-                                                                            toolBodies = toolCollection)
-                combineInput.isKeepToolBodies = False
-                combineInput.isNewComponent = False
-                combineInput.operation = adsk.fusion.FeatureOperations.CutFeatureOperation
-                combine = _rootComp.features.combineFeatures.add(combineInput)
+            seconds = time.time() - startTime
+            self.strategyHistory.record(strategy, faceCount, cornerCount, seconds)
+            self.logger.info(f'{activeBody.name}: {cornerCount} dogbones cut by {strategy} strategy in {seconds:.3f} sec')
 
-                    
             endTlMarker = _design.timeline.markerPosition-1
+            self.tagDogbones(record, startTlMarker, endTlMarker)
             if endTlMarker - startTlMarker >0:
                 timelineGroup = _design.timeline.timelineGroups.add(startTlMarker,endTlMarker)
                 timelineGroup.name = 'dogbone'
 # self.logger.debug('doEvents - allowing fusion to refresh')
 #            adsk.doEvents()
             
+        self.strategyHistory.save()
         if self.errorCount >0:
             dbUtils.messageBox(f'Reported errors:{self.errorCount}\nYou may not need to do anything, \nbut check holes have been created')
             
@@ -1034,7 +1605,7 @@ dog = DogboneCommand()
 def run(context):
     try:
         dog.addButton()
-        # dog.addRefreshButton()
+        dog.addRefreshButton()
     except:
         dbUtils.messageBox(traceback.format_exc())
 
@@ -1044,6 +1615,8 @@ def stop(context):
         _ui.terminateActiveCommand()
         adsk.terminate()
         dog.removeButton()
+        dog.removeRefreshButton()
+        toolBodyCache.clearMemo()
     except:
         dbUtils.messageBox(traceback.format_exc())
 
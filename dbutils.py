@@ -1,5 +1,9 @@
 import math, logging
+import time
 import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
 
 import adsk.core
 import adsk.fusion
@@ -34,8 +38,8 @@ def getAngleBetweenFaces(edge)->float:
         return 0
 
     # Get the normal of each face.
-    _, normal1 = face1.evaluator.getNormalAtPoint(face1.pointOnFace)
-    _, normal2 = face2.evaluator.getNormalAtPoint(face2.pointOnFace)
+    normal1 = getFaceNormal(face1)
+    normal2 = getFaceNormal(face2)
     # Get the angle between the normals.
     normalAngle = normal1.angleTo(normal2)
 
@@ -56,11 +60,30 @@ def getAngleBetweenFaces(edge)->float:
 
     return angle
 
-def findExtent(face, edge):
+def isStartVertexOnFace(face, edge, index = None)->bool:
+    '''
+    uses the adjacency index (O(1)) when available, otherwise scans the face vertices
+    '''
+    if index:
+        try:
+            return index.isStartOnFace(edge, face)
+        except KeyError:
+            pass
+    return edge.startVertex in face.vertices
+
+def isEndVertexOnFace(face, edge, index = None)->bool:
+    if index:
+        try:
+            return index.isEndOnFace(edge, face)
+        except KeyError:
+            pass
+    return edge.endVertex in face.vertices
+
+def findExtent(face, edge, index = None):
     
 #    faceNormal = adsk.core.Vector3D.cast(face.evaluator.getNormalAtPoint(face.pointOnFace)[1])
     
-    if edge.startVertex in face.vertices:
+    if isStartVertexOnFace(face, edge, index):
         return edge.endVertex
     return edge.startVertex
     
@@ -74,20 +97,42 @@ def correctedSketchEdgeVector(edge, refPoint):
         return edge.startSketchPoint.geometry.vectorTo(edge.endSketchPoint.geometry)
     return edge.endSketchPoint.geometry.vectorTo(edge.startSketchPoint.geometry)
 
-def isEdgeAssociatedWithFace(face, edge):
+def isEdgeAssociatedWithFace(face, edge, index = None):
     
     # have to check both ends - not sure which way around the start and end vertices are
+    if index:
+        try:
+            return index.isEdgeAtFace(edge, face)
+        except KeyError:
+            pass
     if edge.startVertex in face.vertices:
         return True
     if edge.endVertex in face.vertices:
         return True
     return False
     
-def getCornerEdgesAtFace(face, edge):
+def getFaceCorner(face, vertex, snapshot):
+    '''
+    FaceCorner of the (native) face at the (native) vertex - both face edges meeting there, their lengths and directions
+    read from the snapshot corner map, raises KeyError if the face or vertex is not part of the snapshot
+    '''
+    return snapshot.faceCornerMap(snapshot.faceIndex(face))[snapshot.vertexIndex(vertex)]
+
+def getCornerEdgesAtFace(face, edge, index = None):
     #not sure which end is which - so test edge ends for inclusion in face
-    startVertex = edge.startVertex if edge.startVertex in face.vertices else edge.endVertex 
+    startVertex = edge.startVertex if isStartVertexOnFace(face, edge, index) else edge.endVertex 
     #edge has 2 adjacent faces - therefore the face that isn't from the 3 faces of startVertex, has to be the top face edges
-    
+
+    if index:
+        try:
+            snapshot = index.snapshot
+            corner = getFaceCorner(face, startVertex, snapshot)
+            cornerEdges = [snapshot.edgeEntities[corner.incoming], snapshot.edgeEntities[corner.outgoing]]
+            if all(cornerEdge.isValid for cornerEdge in cornerEdges):
+                return (cornerEdge for cornerEdge in cornerEdges)
+        except KeyError:
+            pass
+
     vertexEdges = {hash(edge.entityToken): edge for edge in startVertex.edges}
     faceEdges = {hash(edge.entityToken): edge for edge in face.edges}
     commonEdges = set(vertexEdges.keys()) & set(faceEdges.keys()) #intersect both sets
@@ -95,42 +140,204 @@ def getCornerEdgesAtFace(face, edge):
         raise NameError('returnVal len != 2')
     return (faceEdges[token] for token in commonEdges)
 
-def getVertexAtFace(face, edge):
-    if edge.startVertex in face.vertices:
+def getVertexAtFace(face, edge, index = None):
+    if isStartVertexOnFace(face, edge, index):
         return edge.startVertex
     else:
         return edge.endVertex
     return False
 
-def getEdgeVector(edge:adsk.fusion.BRepEdge, refFace:adsk.fusion.BRepFace = None, reverse = False) ->adsk.core.Vector3D:
+def getEdgeVector(edge:adsk.fusion.BRepEdge, refFace:adsk.fusion.BRepFace = None, reverse = False, index = None) ->adsk.core.Vector3D:
     """
     returns vector of the edge paramater (not normalised!)
-    if refFace is supplied - returns vector pointing out from face vertex"""
+    if refFace is supplied - returns vector pointing out from face vertex
+    index (AdjacencyIndex) - optional, makes the face vertex check O(1)"""
     if refFace:
-        reverse = edge.endVertex in refFace.vertices
+        reverse = isEndVertexOnFace(refFace, edge, index)
     startPoint, endPoint = (edge.endVertex.geometry, edge.startVertex.geometry) if reverse else (edge.startVertex.geometry, edge.endVertex.geometry)
     return startPoint.vectorTo(endPoint)
 
     
+class FaceGeometryCache:
+    '''
+    entityToken keyed cache of face normals and planes
+    valid for one command session - clear() when the session starts/ends or the design changes
+    returns fresh Vector3D/Plane objects, so callers are free to modify them
+    '''
+    def __init__(self):
+        self._normals = {}
+        self._origins = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        logger.debug(f'face geometry cache cleared - hits: {self.hits}, misses: {self.misses}')
+        self._normals = {}
+        self._origins = {}
+        self.hits = 0
+        self.misses = 0
+
+    def normal(self, face:adsk.fusion.BRepFace)->adsk.core.Vector3D:
+        faceId = hash(face.entityToken)
+        normal = self._normals.get(faceId)
+        if normal is None:
+            self.misses += 1
+            normal = self._normals[faceId] = face.evaluator.getNormalAtPoint(face.pointOnFace)[1].asArray()
+        else:
+            self.hits += 1
+        return adsk.core.Vector3D.create(*normal)
+
+    def plane(self, face:adsk.fusion.BRepFace)->adsk.core.Plane:
+        '''
+        plane through the first vertex of the face
+        '''
+        faceId = hash(face.entityToken)
+        origin = self._origins.get(faceId)
+        if origin is None:
+            origin = self._origins[faceId] = face.vertices.item(0).geometry.asArray()
+        return adsk.core.Plane.create(adsk.core.Point3D.create(*origin), self.normal(face))
+
+faceGeometryCache = FaceGeometryCache()
+
 def getFaceNormal(face):
-    return face.evaluator.getNormalAtPoint(face.pointOnFace)[1]
+    return faceGeometryCache.normal(face)
+
+def getFacePlane(face):
+    return faceGeometryCache.plane(face)
     
     
+@dataclass
+class UserParameterSpec:
+    '''
+    desired state of one user parameter - either an expression, or a plain (unitless) value
+    comment or isFavorite None leaves that property as it is
+    '''
+    name: str
+    expression: Optional[str] = None
+    value: Optional[float] = None
+    units: str = ''
+    comment: Optional[str] = None
+    isFavorite: Optional[bool] = None
+
+
+def syncUserParameters(design:adsk.fusion.Design, specs)->int:
+    '''
+    brings the user parameters in line with specs, writing only what actually differs - every write to a
+    parameter the dogbones depend on recomputes them, so unchanged parameters must not be touched
+    returns the number of writes made
+    '''
+    normalise = lambda expression: ''.join(expression.split())
+    userParams:adsk.fusion.UserParameters = design.userParameters
+    writes = 0
+    for spec in specs:
+        parameter = userParams.itemByName(spec.name)
+        if not parameter:
+            valueInput = adsk.core.ValueInput.createByString(spec.expression) if spec.expression is not None else adsk.core.ValueInput.createByReal(spec.value)
+            parameter = userParams.add(spec.name, valueInput, spec.units, spec.comment or '')
+            writes += 1
+        elif spec.expression is not None:
+            if normalise(parameter.expression) != normalise(spec.expression):
+                parameter.expression = spec.expression
+                writes += 1
+        elif abs(parameter.value - spec.value) > 1e-9:
+            parameter.value = spec.value
+            writes += 1
+
+        if spec.comment is not None and parameter.comment != spec.comment:
+            parameter.comment = spec.comment
+            writes += 1
+        if spec.isFavorite is not None and parameter.isFavorite != spec.isFavorite:
+            parameter.isFavorite = spec.isFavorite
+            writes += 1
+    logger.debug(f'user parameters synchronised - {writes} writes')
+    return writes
+
+
+class DeferredCompute:
+    '''
+    execution context for one dogbone run - per phase timings, and features whose compute is held back
+    features passed to defer() are suppressed straight away; when the context closes the timeline marker is
+    rolled back in front of the first of them, they are unsuppressed there (nothing behind the marker is
+    computed) and moving the marker to the end recomputes them all in one pass
+        with DeferredCompute(design) as batch, batch.phase('features'):
+            ...
+            batch.defer(holeFeature)
+    '''
+    def __init__(self, design:adsk.fusion.Design):
+        self.design = design
+        self.features = []
+        self.phases = {}
+        self.startTime = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        if self.features:
+            with self.phase('recompute'):
+                self.release()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        startTime = time.time()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.time() - startTime
+
+    def defer(self, feature):
+        feature.isSuppressed = True
+        self.features.append(feature)
+
+    def release(self):
+        if not self.features:
+            return
+        timeline = self.design.timeline
+        timeline.markerPosition = min(feature.timelineObject.index for feature in self.features)
+        try:
+            for feature in self.features:
+                feature.isSuppressed = False
+            logger.debug(f'{len(self.features)} deferred features recomputed in one pass')
+        finally:
+            # never leave the timeline rolled back, even if a feature fails to unsuppress
+            timeline.moveToEnd()
+            self.features = []
+
+    def summary(self):
+        phases = ', '.join(f'{name}: {seconds:.3f} sec' for name, seconds in self.phases.items())
+        return f'{phases}, total: {time.time() - self.startTime:.3f} sec'
+
+
 def messageBox(*args):
     adsk.core.Application.get().userInterface.messageBox(*args)
 
 
-def getTopFace(selectedFace:adsk.fusion.BRepFace)->adsk.fusion.BRepFace:
+def getTopFace(selectedFace:adsk.fusion.BRepFace, heightIndex = None)->adsk.fusion.BRepFace:
+    '''
+    returns (topFace, refPoint) - the parallel face of the body furthest along the selectedFace normal
+    heightIndex (HeightIndex of the native body) - optional, replaces the scan over every body face with a bucket lookup
+    '''
+    if heightIndex:
+        try:
+            snapshot = heightIndex.snapshot
+            topFace = snapshot.faceEntities[heightIndex.topFace(snapshot.faceIndex(selectedFace))]
+            if topFace.isValid:
+                refPoint = topFace.nativeObject.pointOnFace if topFace.assemblyContext else topFace.pointOnFace
+                return (topFace, refPoint)
+        except KeyError:
+            pass
+
     normal = getFaceNormal(selectedFace)
-    refPlane = adsk.core.Plane.create(selectedFace.vertices.item(0).geometry, normal)
-    refLine = adsk.core.InfiniteLine3D.create(selectedFace.vertices.item(0).geometry, normal)
+    refPlane = getFacePlane(selectedFace)
+    refLine = adsk.core.InfiniteLine3D.create(refPlane.origin, normal)
     refPoint = refPlane.intersectWithLine(refLine)
     faceList = []
     body = adsk.fusion.BRepBody.cast(selectedFace.body)
     for face in body.faces:
         if not normal.isParallelTo(getFaceNormal(face)):
             continue
-        facePlane = adsk.core.Plane.create(face.vertices.item(0).geometry, normal)
+        facePlane = adsk.core.Plane.create(getFacePlane(face).origin, normal)
         intersectionPoint = facePlane.intersectWithLine(refLine)
 #        distanceToRefPoint = refPoint.distanceTo(intersectionPoint)
         directionVector = refPoint.vectorTo(intersectionPoint)
@@ -144,18 +351,84 @@ def getTopFace(selectedFace:adsk.fusion.BRepFace)->adsk.fusion.BRepFace:
     return (top[0], refPoint)
  
 
-def getTranslateVectorBetweenFaces(fromFace, toFace):
+def createPrism(loop, height)->adsk.fusion.BRepBody:
+    '''
+    transient solid of a closed 2D outline (counterclockwise DbProfile Segments in the xy plane)
+    extruded from z = 0 to z = height - built directly as a B-Rep, no boolean needed
+    returns None if Fusion can't make a valid body from it
+    '''
+    bodyDef = adsk.fusion.BRepBodyDefinition.create()
+    shellDef = bodyDef.lumpDefinitions.add().shellDefinitions.add()
+    zAxis = adsk.core.Vector3D.create(0, 0, 1)
+    xAxis = adsk.core.Vector3D.create(1, 0, 0)
+
+    bottomVertices = [bodyDef.createVertexDefinition(adsk.core.Point3D.create(*segment.start, 0)) for segment in loop]
+    topVertices = [bodyDef.createVertexDefinition(adsk.core.Point3D.create(*segment.start, height)) for segment in loop]
+    verticalEdges = [bodyDef.createEdgeDefinitionByCurve(bottom, top, 
+                        adsk.core.Line3D.create(adsk.core.Point3D.create(*segment.start, 0), adsk.core.Point3D.create(*segment.start, height)))
+                     for bottom, top, segment in zip(bottomVertices, topVertices, loop)]
+
+    bottomEdges, topEdges = [], []
+    for i, segment in enumerate(loop):
+        j = (i + 1) % len(loop)
+        for z, vertices, edges in ((0, bottomVertices, bottomEdges), (height, topVertices, topEdges)):
+            if segment.isArc:
+                curve = adsk.core.Arc3D.createByCenter(adsk.core.Point3D.create(*segment.centre, z), zAxis, xAxis, 
+                                                       segment.radius, segment.startAngle, segment.endAngle)
+            else:
+                curve = adsk.core.Line3D.create(adsk.core.Point3D.create(*segment.start, z), adsk.core.Point3D.create(*segment.end, z))
+            edges.append(bodyDef.createEdgeDefinitionByCurve(vertices[i], vertices[j], curve))
+
+    # side faces - outward normal to the right of the (counterclockwise) direction of travel
+    for i, segment in enumerate(loop):
+        j = (i + 1) % len(loop)
+        if segment.isArc:
+            surface = adsk.core.Cylinder.create(adsk.core.Point3D.create(*segment.centre, 0), zAxis, segment.radius)
+        else:
+            tx, ty = segment.tangent()
+            surface = adsk.core.Plane.create(adsk.core.Point3D.create(*segment.start, 0), adsk.core.Vector3D.create(ty, -tx, 0))
+        loopDef = shellDef.faceDefinitions.add(surface, False).loopDefinitions.add()
+        loopDef.bRepCoEdgeDefinitions.add(bottomEdges[i], False)
+        loopDef.bRepCoEdgeDefinitions.add(verticalEdges[j], False)
+        loopDef.bRepCoEdgeDefinitions.add(topEdges[i], True)
+        loopDef.bRepCoEdgeDefinitions.add(verticalEdges[i], True)
+
+    bottomLoop = shellDef.faceDefinitions.add(adsk.core.Plane.create(adsk.core.Point3D.create(0, 0, 0), adsk.core.Vector3D.create(0, 0, -1)), False).loopDefinitions.add()
+    for edge in reversed(bottomEdges):
+        bottomLoop.bRepCoEdgeDefinitions.add(edge, True)
+    topLoop = shellDef.faceDefinitions.add(adsk.core.Plane.create(adsk.core.Point3D.create(0, 0, height), zAxis), False).loopDefinitions.add()
+    for edge in topEdges:
+        topLoop.bRepCoEdgeDefinitions.add(edge, False)
+
+    try:
+        body = bodyDef.createBody()
+    except RuntimeError:
+        logger.exception('prism creation failed')
+        return None
+    return body if body and body.isSolid else None
+
+
+def getTranslateVectorBetweenFaces(fromFace, toFace, snapshot = None):
 #   returns absolute distance
+#   snapshot (TopologySnapshot of the native body) - optional, parallel check by direction key instead of normal evaluation
 
     normal = getFaceNormal(fromFace)
-    if not normal.isParallelTo(getFaceNormal(fromFace)):
-        return False
+    try:
+        if not snapshot:
+            raise KeyError
+        fromDirection = snapshot.faceDirections[snapshot.faceIndex(fromFace.nativeObject or fromFace)]
+        toDirection = snapshot.faceDirections[snapshot.faceIndex(toFace.nativeObject or toFace)]
+        if fromDirection is None or toDirection is None or fromDirection[0] != toDirection[0]:
+            return False
+    except KeyError:
+        if not normal.isParallelTo(getFaceNormal(toFace)):
+            return False
 
-    fromFacePlane = adsk.core.Plane.create(fromFace.vertices.item(0).geometry, normal)
-    fromFaceLine = adsk.core.InfiniteLine3D.create(fromFace.vertices.item(0).geometry, normal)
+    fromFacePlane = getFacePlane(fromFace)
+    fromFaceLine = adsk.core.InfiniteLine3D.create(fromFacePlane.origin, normal)
     fromFacePoint = fromFacePlane.intersectWithLine(fromFaceLine)
     
-    toFacePlane = adsk.core.Plane.create(toFace.vertices.item(0).geometry, normal)
+    toFacePlane = adsk.core.Plane.create(getFacePlane(toFace).origin, normal)
     toFacePoint = toFacePlane.intersectWithLine(fromFaceLine)
     translateVector = fromFacePoint.vectorTo(toFacePoint)
     return translateVector
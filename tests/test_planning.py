@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+planDogbones and mergeAxes keyed by edge objects, as createStaticDogbones uses them - DbPlanning has no adsk imports.
+    python -m pytest tests
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DbPlanning import mergeAxes, planDogbones
+
+
+class Edge:
+    '''
+    hashes like DbEdge - by the hash of its entity token, equality by identity
+    '''
+    def __init__(self, entityToken):
+        self._edgeId = hash(entityToken)
+
+    def __hash__(self):
+        return self._edgeId
+
+
+class Face:
+    def __init__(self, faceId, direction, edges):
+        self.faceId, self.direction, self.selectedEdges = faceId, direction, edges
+
+
+def test_plans_split_by_face_direction():
+    up, down, upAgain = Face('up', (0, 0, 1), ['a', 'b']), Face('down', (0, 0, -1), ['c']), Face('up', (0, 0, 1), ['a', 'b'])
+    plans = planDogbones({'occurrence 1': [up, down], 'occurrence 2': [upAgain]},
+                         bodyId = lambda face: 'body',
+                         faceId = lambda face: face.faceId,
+                         edgeId = lambda edge: edge,
+                         directionId = lambda face: face.direction)
+
+    assert list(plans) == [('body', (0, 0, 1)), ('body', (0, 0, -1))]
+    upPlan = plans[('body', (0, 0, 1))]
+    assert upPlan.edges == ['a', 'b']
+    assert upPlan.duplicateEdges == 2
+    assert upPlan.occurrenceIds == {'occurrence 1', 'occurrence 2'}
+    assert plans[('body', (0, 0, -1))].edges == ['c']
+
+
+def test_stacked_axes_join():
+    top, middle, bottom = Edge('top'), Edge('middle'), Edge('bottom')
+    axes = {top: ((0.0, 0.0, 3.0), (0.0, 0.0, 2.0)),
+            middle: ((0.0, 0.0, 2.0), (0.0, 0.0, 1.0)),
+            bottom: ((0.0, 0.0, 1.0), (0.0, 0.0, 0.0))}
+    absorbed, contained, joined = mergeAxes(axes, 0.25)
+
+    assert (contained, joined) == (0, 2)
+    assert absorbed == {middle, bottom}
+    assert axes[top] == ((0.0, 0.0, 3.0), (0.0, 0.0, 0.0))
+    assert [edge for edge in (top, middle, bottom) if edge not in absorbed] == [top]
+
+
+def test_contained_axis_dropped():
+    outer, inner, apart = Edge('outer'), Edge('inner'), Edge('apart')
+    axes = {outer: ((0.0, 0.0, 2.0), (0.0, 0.0, 0.0)),
+            inner: ((0.0, 0.0, 2.0), (0.0, 0.0, 1.0)),
+            apart: ((5.0, 0.0, 2.0), (5.0, 0.0, 0.0))}
+    absorbed, contained, joined = mergeAxes(axes, 0.25)
+
+    assert (contained, joined) == (1, 0)
+    assert absorbed == {inner}
+    assert axes[outer] == ((0.0, 0.0, 2.0), (0.0, 0.0, 0.0))
+
+
+def test_gap_keeps_axes_apart():
+    upper, lower = Edge('upper'), Edge('lower')
+    axes = {upper: ((0.0, 0.0, 3.0), (0.0, 0.0, 2.0)),
+            lower: ((0.0, 0.0, 1.0), (0.0, 0.0, 0.0))}
+    absorbed, contained, joined = mergeAxes(axes, 0.25)
+
+    assert absorbed == set()
+    assert (contained, joined) == (0, 0)